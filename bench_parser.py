@@ -0,0 +1,102 @@
+"""Micro-benchmark for the monerod log line classifier.
+
+Usage:
+    python bench_parser.py [path/to/bitmonero.log] [--repeat N]
+
+Without a log file a synthetic corpus shaped like monerod's initial-sync
+output is used. The legacy per-line parser (uncompiled regexes and repeated
+lower() calls) is timed against parse_monerod_line on the same lines.
+"""
+import argparse
+import random
+import re
+import time
+
+from monerod_log import parse_monerod_line
+
+
+def legacy_parse(log_line):
+    """The pre-classifier parse_monerod_log logic, minus the status writes"""
+    events = []
+    height_match = re.search(r'Height: (\d+)', log_line)
+    if height_match:
+        events.append(int(height_match.group(1)))
+    if "Synced" in log_line:
+        events.append('Synced')
+    elif "synchronizing" in log_line.lower():
+        events.append('Synchronizing')
+    if "mining" in log_line.lower() and "started" in log_line.lower():
+        events.append('Mining active')
+    elif "mining" in log_line.lower() and ("stopped" in log_line.lower() or "paused" in log_line.lower()):
+        events.append('Mining stopped')
+    hash_match = re.search(r'(\d+\.?\d*)\s*H/s', log_line)
+    if hash_match:
+        events.append(hash_match.group(1))
+    return events
+
+
+def synthetic_corpus(count=200000, seed=1):
+    """Lines in the proportions monerod prints them while syncing"""
+    rng = random.Random(seed)
+    target = 3150000
+    lines = []
+    height = 1
+    for _ in range(count):
+        roll = rng.random()
+        stamp = f"2024-05-01 10:{rng.randrange(60):02d}:{rng.randrange(60):02d}.{rng.randrange(1000):03d}\t"
+        peer = f"[{rng.randrange(1, 255)}.{rng.randrange(255)}.{rng.randrange(255)}.{rng.randrange(255)}:18080 OUT]"
+        if roll < 0.55:
+            height += rng.randrange(1, 40)
+            left = target - height
+            lines.append(f"{stamp}I Synced {height}/{target} ({height * 100 // target}%, {left} left)")
+        elif roll < 0.75:
+            lines.append(f"{stamp}I {peer} Sync data returned a new top block candidate: {height} -> {target} "
+                         f"[Your node is {target - height} blocks (10.9 years) behind]")
+        elif roll < 0.95:
+            lines.append(f"{stamp}I {peer} Requesting callback, {rng.randrange(1000)} blocks queued, "
+                         f"span {height}-{height + 20}")
+        elif roll < 0.99:
+            lines.append(f"{stamp}I Height: {height}/{target} ({height * 100 / target:.1f}%) on mainnet, not mining, "
+                         f"net hash 2.5 GH/s, v16, {rng.randrange(12)}(out)+{rng.randrange(4)}(in) connections, "
+                         f"uptime 0d 1h 2m 3s")
+        else:
+            lines.append(f"{stamp}I SYNCHRONIZATION started")
+    return lines
+
+
+def load_corpus(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return [line.rstrip("\r\n") for line in f]
+
+
+def time_parser(parse, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in lines:
+            parse(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", help="recorded monerod log to replay")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per parser, best is reported")
+    args = parser.parse_args()
+
+    lines = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    print(f"Corpus: {args.corpus or 'synthetic'} ({len(lines)} lines), best of {args.repeat}")
+
+    results = {}
+    for name, parse in (("legacy", legacy_parse), ("classifier", parse_monerod_line)):
+        elapsed = time_parser(parse, lines, args.repeat)
+        results[name] = elapsed
+        print(f"{name:>10}: {elapsed * 1000:8.1f} ms  {len(lines) / elapsed:12,.0f} lines/s  "
+              f"{elapsed / len(lines) * 1e9:7.0f} ns/line")
+    print(f"Speedup: {results['legacy'] / results['classifier']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
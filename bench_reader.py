@@ -0,0 +1,106 @@
+"""Throughput benchmark for child-process log ingestion.
+
+Usage:
+    python bench_reader.py [--rate 100000] [--seconds 3]
+
+Spawns a synthetic process that prints monerod-style lines at the given
+rate and ingests its output twice: once with the legacy design (text-mode
+pipe, one reader thread calling readline() per line) and once with the
+I/O loop (chunked binary reads, batched decode and dispatch). Each line is
+stored in a LogBuffer and run through parse_monerod_line in both cases.
+"""
+import argparse
+import subprocess
+import sys
+import threading
+import time
+
+from xmrtor import LogBuffer, parse_monerod_line, spawn_process
+
+CHILD = r'''
+import sys, time
+rate, seconds = int(sys.argv[1]), float(sys.argv[2])
+burst = max(1, rate // 100)
+template = "2024-05-01 10:00:00.000\tI Synced {0}/3150000 (0%, {1} left)\n"
+write = sys.stdout.write
+started = time.perf_counter()
+sent = 0
+while sent < rate * seconds:
+    write("".join(template.format(n, 3150000 - n) for n in range(sent, sent + burst)))
+    sent += burst
+    ahead = sent / rate - (time.perf_counter() - started)
+    if ahead > 0:
+        time.sleep(ahead)
+sys.stdout.flush()
+'''
+
+
+def child_args(rate, seconds):
+    return [sys.executable, "-c", CHILD, str(rate), str(seconds)]
+
+
+def run_legacy(rate, seconds):
+    buffer = LogBuffer()
+    process = subprocess.Popen(child_args(rate, seconds), stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True, bufsize=1)
+
+    def reader():
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                break
+            line = line.strip()
+            buffer.append(line)
+            parse_monerod_line(line)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    thread.join()
+    process.wait()
+    return buffer.last_seq
+
+
+def run_io_loop(rate, seconds):
+    buffer = LogBuffer()
+
+    def on_lines(lines):
+        buffer.extend(lines)
+        for line in lines:
+            parse_monerod_line(line)
+
+    process = spawn_process(child_args(rate, seconds), on_lines)
+    process.wait()
+    # The pump may still be dispatching the final chunk
+    expected = int(rate * seconds)
+    deadline = time.monotonic() + 30
+    while buffer.last_seq < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return buffer.last_seq
+
+
+def measure(name, run, rate, seconds):
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    lines = run(rate, seconds)
+    wall = time.perf_counter() - wall_started
+    cpu = time.process_time() - cpu_started
+    print(f"{name:>8}: {lines:9,d} lines  wall {wall:6.2f} s  ({lines / wall:10,.0f} lines/s)  "
+          f"launcher CPU {cpu:6.2f} s  ({cpu / max(lines, 1) * 1e6:5.2f} us/line)  "
+          f"lag {max(0.0, wall - seconds):5.2f} s")
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=100000, help="lines per second printed by the child")
+    parser.add_argument("--seconds", type=float, default=3, help="how long the child prints")
+    args = parser.parse_args()
+
+    print(f"Child prints {args.rate:,} lines/s for {args.seconds} s")
+    legacy = measure("legacy", run_legacy, args.rate, args.seconds)
+    io_loop = measure("io loop", run_io_loop, args.rate, args.seconds)
+    print(f"Launcher CPU reduction: {legacy / io_loop:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
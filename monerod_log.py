@@ -0,0 +1,88 @@
+"""monerod log line classifier.
+
+Kept free of the launcher's globals so it can be benchmarked and tested on
+its own; xmrtor.py folds the events it returns into the status.
+"""
+import re
+from collections import namedtuple
+
+LogEvent = namedtuple('LogEvent', 'kind value')
+
+# Event kinds produced by parse_monerod_line
+HEIGHT = 'height'
+TARGET_HEIGHT = 'target_height'
+SYNC_STATE = 'sync_state'
+MINING_STATE = 'mining_state'
+HASH_RATE = 'hash_rate'
+PEER_COUNT = 'peer_count'
+PEER_CONNECTED = 'peer_connected'
+PEER_DISCONNECTED = 'peer_disconnected'
+
+# One cheap scan decides whether a line is worth parsing at all; most lines
+# monerod prints during sync match none of these keywords
+_TRIGGER_RE = re.compile(r'height: |synced |synchroni|mining|h/s|connection|top block candidate')
+_HEIGHT_RE = re.compile(r'height: (\d+)')
+_SYNC_PROGRESS_RE = re.compile(r'synced (\d+)/(\d+)')
+_TOP_BLOCK_RE = re.compile(r'top block candidate: \d+ -> (\d+)')
+_HASH_RATE_RE = re.compile(r'(\d+\.?\d*)\s*h/s')
+_PEER_COUNT_RE = re.compile(r'(\d+)\(out\)\+(\d+)\(in\) connections')
+
+def parse_monerod_line(log_line):
+    """Classify one monerod output line into a tuple of LogEvents"""
+    line = log_line.lower()
+    trigger = _TRIGGER_RE.search(line)
+    if trigger is None:
+        return ()
+    
+    events = []
+    keyword = trigger.group()
+    
+    if keyword == 'synced ':
+        # "Synced 1200/3150000 (0%, 3148800 left)" is a progress line
+        progress = _SYNC_PROGRESS_RE.search(line, trigger.start())
+        if progress:
+            height, target = int(progress.group(1)), int(progress.group(2))
+            events.append(LogEvent(HEIGHT, height))
+            events.append(LogEvent(TARGET_HEIGHT, target))
+            events.append(LogEvent(SYNC_STATE, 'Synced' if height >= target else 'Synchronizing'))
+        return tuple(events)
+    
+    if keyword == 'top block candidate':
+        candidate = _TOP_BLOCK_RE.search(line, trigger.start())
+        if candidate:
+            events.append(LogEvent(TARGET_HEIGHT, int(candidate.group(1))))
+        return tuple(events)
+    
+    # "Height: 3150000/3150000 (100.0%) on mainnet, mining at 1.2 kH/s, ..." from
+    # the status command can carry several facts, so fall through to all checks
+    height = _HEIGHT_RE.search(line, trigger.start())
+    if height:
+        events.append(LogEvent(HEIGHT, int(height.group(1))))
+    
+    if 'synchroni' in line:
+        if 'synchronized' in line and 'not synchronized' not in line:
+            events.append(LogEvent(SYNC_STATE, 'Synced'))
+        elif 'synchronizing' in line or 'synchronization started' in line:
+            events.append(LogEvent(SYNC_STATE, 'Synchronizing'))
+    
+    if 'mining' in line:
+        if 'started' in line:
+            events.append(LogEvent(MINING_STATE, 'Mining active'))
+        elif 'stopped' in line or 'paused' in line:
+            events.append(LogEvent(MINING_STATE, 'Mining stopped'))
+    
+    if 'h/s' in line:
+        hash_rate = _HASH_RATE_RE.search(line)
+        if hash_rate:
+            events.append(LogEvent(HASH_RATE, f"{hash_rate.group(1)} H/s"))
+    
+    if 'connection' in line:
+        peers = _PEER_COUNT_RE.search(line)
+        if peers:
+            events.append(LogEvent(PEER_COUNT, int(peers.group(1)) + int(peers.group(2))))
+        elif 'new connection' in line:
+            events.append(LogEvent(PEER_CONNECTED, None))
+        elif 'close connection' in line:
+            events.append(LogEvent(PEER_DISCONNECTED, None))
+    
+    return tuple(events)
@@ -0,0 +1,30 @@
+"""CrashHistory: restart backoff and crash-loop detection"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmrtor import (CRASH_LOOP_LIMIT, RESTART_BACKOFF_INITIAL, RESTART_BACKOFF_MAX, RESTART_STABLE_AFTER,
+                    CrashHistory)
+
+
+class CrashHistoryTest(unittest.TestCase):
+    def test_backoff_doubles_until_crash_loop(self):
+        history = CrashHistory()
+        delays = [history.record(1) for _ in range(CRASH_LOOP_LIMIT)]
+        self.assertEqual(delays[0], RESTART_BACKOFF_INITIAL)
+        self.assertEqual(delays[1], min(2 * RESTART_BACKOFF_INITIAL, RESTART_BACKOFF_MAX))
+        self.assertIsNone(history.record(1))
+        self.assertEqual(len(history), CRASH_LOOP_LIMIT + 1)
+
+    def test_stable_run_forgets_earlier_crashes(self):
+        history = CrashHistory()
+        for _ in range(3):
+            history.record(1)
+        self.assertEqual(history.record(RESTART_STABLE_AFTER), RESTART_BACKOFF_INITIAL)
+        self.assertEqual(len(history), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
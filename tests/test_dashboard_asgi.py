@@ -0,0 +1,96 @@
+"""DashboardAsgi pass-through to Flask, driven as a bare ASGI app (no uvicorn needed)"""
+import asyncio
+import json
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xmrtor
+from xmrtor import DashboardAsgi, app, hash_password, load_pages
+
+
+async def call(asgi, method, path, query=b'', headers=(), body=b''):
+    scope = {'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+             'root_path': '', 'query_string': query, 'headers': list(headers),
+             'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8080)}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+    
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+    
+    async def send(message):
+        sent.append(message)
+    
+    await asgi(scope, receive, send)
+    headers = {}
+    for name, value in sent[0]['headers']:
+        headers.setdefault(name.decode(), []).append(value.decode())
+    return sent[0]['status'], headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+class DashboardAsgiTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_pages()
+        xmrtor.master_password = hash_password('correct horse')
+        if 'asgi_test_slow' not in app.view_functions:
+            app.add_url_rule('/asgi-test/slow', 'asgi_test_slow', lambda: (time.sleep(1), 'slow')[1])
+            app.add_url_rule('/asgi-test/echo', 'asgi_test_echo', methods=['POST'], view_func=lambda: json.dumps({
+                'args': xmrtor.request.args.to_dict(), 'body': xmrtor.request.get_data(as_text=True),
+                'cookie': xmrtor.request.headers.get('Cookie'), 'remote': xmrtor.request.remote_addr}))
+        cls.asgi = DashboardAsgi(app)
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_login_sets_a_session_the_api_accepts(self):
+        async def scenario():
+            status, headers, _ = await call(self.asgi, 'POST', '/login', body=b'password=correct+horse', headers=[
+                (b'content-type', b'application/x-www-form-urlencoded')])
+            self.assertEqual(status, 302)
+            cookie = headers['set-cookie'][0].split(';', 1)[0]
+            status, _, body = await call(self.asgi, 'GET', '/api/status', headers=[(b'cookie', cookie.encode())])
+            self.assertEqual(status, 200)
+            self.assertIn('block_height', json.loads(body))
+            status, _, _ = await call(self.asgi, 'GET', '/api/status')
+            self.assertEqual(status, 401)
+        self.run_async(scenario())
+
+    def test_environ_carries_query_body_and_headers(self):
+        status, _, body = self.run_async(call(
+            self.asgi, 'POST', '/asgi-test/echo', query=b'a=1&b=two', body=b'payload',
+            headers=[(b'cookie', b'x=1'), (b'cookie', b'y=2'), (b'content-length', b'7')]))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {'args': {'a': '1', 'b': 'two'}, 'body': 'payload',
+                                            'cookie': 'x=1; y=2', 'remote': '127.0.0.1'})
+
+    def test_slow_route_does_not_hold_up_others(self):
+        async def scenario():
+            slow = asyncio.ensure_future(call(self.asgi, 'GET', '/asgi-test/slow'))
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            status, _, _ = await call(self.asgi, 'GET', '/login')
+            fast = time.monotonic() - started
+            self.assertEqual(status, 200)
+            self.assertLess(fast, 0.5)
+            self.assertEqual((await slow)[2], b'slow')
+        self.run_async(scenario())
+
+    def test_native_routes_record_latency(self):
+        def count(route):
+            entry = xmrtor.HTTP_LATENCY._values.get((route, 'GET'))
+            return entry[2] if entry else 0
+        before = count('/api/logs/<service>'), count('/api/stream')
+        status, _, _ = self.run_async(call(self.asgi, 'GET', '/api/logs/monerod', query=b'since=0&wait=1'))
+        self.assertEqual(status, 401)
+        status, _, _ = self.run_async(call(self.asgi, 'GET', '/api/stream'))
+        self.assertEqual(status, 401)
+        self.assertEqual((count('/api/logs/<service>'), count('/api/stream')), (before[0] + 1, before[1] + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""LogArchive: search filters, restarts and recovery from a torn write"""
+import os
+import re
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmrtor import LogArchive, app, log_archives, search_logs
+
+
+class LogArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'monerod')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def lines(self, archive, **filters):
+        return [(entry.seq, entry.line) for entry in archive.search(**filters)]
+
+    def test_search_filters(self):
+        archive = LogArchive(self.directory)
+        archive.append(['Synced 10/100', 'peer connected'], ts=1000.0)
+        archive.flush()
+        archive.append(['Synced 20/100', 'ERROR: peer dropped'], ts=2000.0)
+        archive.flush()
+        
+        self.assertEqual(len(self.lines(archive)), 4)
+        self.assertEqual(self.lines(archive, start=1500), [(3, 'Synced 20/100'), (4, 'ERROR: peer dropped')])
+        self.assertEqual(self.lines(archive, end=1500, contains='peer'), [(2, 'peer connected')])
+        self.assertEqual(self.lines(archive, pattern=re.compile(r'Synced \d0/')), [(1, 'Synced 10/100'), (3, 'Synced 20/100')])
+        self.assertEqual(self.lines(archive, after_seq=3), [(4, 'ERROR: peer dropped')])
+        self.assertEqual(len(self.lines(archive, limit=1)), 1)
+
+    def test_sequence_continues_after_restart(self):
+        first = LogArchive(self.directory)
+        first.append(['one', 'two'])
+        first.flush()
+        second = LogArchive(self.directory)
+        second.append(['three'])
+        second.flush()
+        self.assertEqual(self.lines(second), [(1, 'one'), (2, 'two'), (3, 'three')])
+
+    def test_rotation_keeps_newest_segments(self):
+        archive = LogArchive(self.directory, segment_bytes=1, max_segments=2)
+        for n in range(4):
+            archive.append([f'line {n}'])
+            archive.flush()
+        self.assertEqual(len(archive.segments), 2)
+        self.assertEqual(self.lines(archive), [(3, 'line 2'), (4, 'line 3')])
+
+    def test_recovers_from_torn_write(self):
+        archive = LogArchive(self.directory)
+        archive.append(['before crash'])
+        archive.flush()
+        segment = archive.segments[-1]
+        # A crash after writing a member but before its index line, then a partial index line
+        with open(segment.path, 'ab') as f:
+            f.write(b'\x1f\x8b\x08 unindexed member')
+        with open(segment.index_path, 'a', encoding='utf-8') as f:
+            f.write('999 12 2')
+        
+        restarted = LogArchive(self.directory)
+        restarted.append(['after restart'])
+        restarted.flush()
+        restarted.append(['and later'])
+        restarted.flush()
+        expected = [(1, 'before crash'), (2, 'after restart'), (3, 'and later')]
+        self.assertEqual(self.lines(restarted), expected)
+        self.assertEqual(self.lines(LogArchive(self.directory)), expected)
+
+    def test_search_api_pages_with_archive_cursor(self):
+        archive = LogArchive(self.directory)
+        archive.append([f'line {n}' for n in range(5)], ts=1000.0)
+        with mock.patch.dict(log_archives, {'monerod': archive}):
+            with app.test_request_context('/api/logs/monerod?after=0&limit=2'):
+                page = search_logs('monerod').get_json()
+            with app.test_request_context(f"/api/logs/monerod?after={page['next_after']}&limit=2"):
+                following = search_logs('monerod').get_json()
+        self.assertNotIn('last_seq', page)
+        self.assertTrue(page['logs'][0].endswith('line 0'))
+        self.assertTrue(following['logs'][0].endswith('line 2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
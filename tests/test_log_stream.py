@@ -0,0 +1,60 @@
+"""Log deltas for the long-poll API and the SSE stream never drop lines silently"""
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmrtor import LOG_BUFFER_CAPACITY, LogBuffer, StreamState, log_buffers, log_delta
+
+
+def log_events(messages):
+    events = {}
+    for message in messages:
+        fields = dict(line.split(': ', 1) for line in message.strip().splitlines() if ': ' in line)
+        if fields.get('event') == 'log':
+            data = json.loads(fields['data'])
+            events[data['service']] = data
+    return events
+
+
+class LogDeltaTest(unittest.TestCase):
+    def test_delta_carries_every_line_after_the_cursor(self):
+        buffer = LogBuffer()
+        buffer.append('first')
+        buffer.extend([f'l{n}' for n in range(300)])
+        delta = log_delta(buffer, 1)
+        self.assertEqual(len(delta['logs']), 300)
+        self.assertEqual((delta['last_seq'], delta['reset'], delta['truncated']), (301, False, False))
+
+    def test_overrun_cursor_is_flagged(self):
+        buffer = LogBuffer()
+        buffer.append('first')
+        buffer.extend([f'l{n}' for n in range(LOG_BUFFER_CAPACITY + 10)])
+        delta = log_delta(buffer, 1)
+        self.assertEqual(len(delta['logs']), LOG_BUFFER_CAPACITY)
+        self.assertTrue(delta['truncated'])
+
+
+class StreamStateTest(unittest.TestCase):
+    def test_stream_sends_whole_batch_after_cursor(self):
+        buffer = log_buffers['monerod']
+        buffer.append('before')
+        state = StreamState(f"0-{buffer.last_seq}")
+        buffer.extend([f'l{n}' for n in range(300)])
+        event = log_events(state.pending())['monerod']
+        self.assertEqual(event['logs'], [f'l{n}' for n in range(300)])
+        self.assertEqual((event['reset'], event['truncated'], event['last_seq']), (False, False, buffer.last_seq))
+
+    def test_stream_flags_lines_lost_to_the_ring(self):
+        buffer = log_buffers['monerod']
+        state = StreamState(f"0-{buffer.last_seq}")
+        buffer.extend([f'l{n}' for n in range(LOG_BUFFER_CAPACITY + 1)])
+        event = log_events(state.pending())['monerod']
+        self.assertTrue(event['truncated'])
+        self.assertEqual(len(event['logs']), LOG_BUFFER_CAPACITY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""parse_monerod_line on the lines monerod prints while syncing and running"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monerod_log import (HASH_RATE, HEIGHT, MINING_STATE, PEER_CONNECTED, PEER_COUNT, PEER_DISCONNECTED,
+                         SYNC_STATE, TARGET_HEIGHT, LogEvent, parse_monerod_line)
+
+
+class ParseMonerodLineTest(unittest.TestCase):
+    def assertEvents(self, line, *events):
+        self.assertEqual(parse_monerod_line(line), tuple(LogEvent(kind, value) for kind, value in events))
+
+    def test_sync_progress(self):
+        self.assertEvents("2024-05-01 10:00:00.000\tI Synced 1200/3150000 (0%, 3148800 left)",
+                          (HEIGHT, 1200), (TARGET_HEIGHT, 3150000), (SYNC_STATE, 'Synchronizing'))
+        self.assertEvents("I Synced 3150000/3150000", (HEIGHT, 3150000), (TARGET_HEIGHT, 3150000), (SYNC_STATE, 'Synced'))
+
+    def test_top_block_candidate(self):
+        self.assertEvents("I [1.2.3.4:18080 OUT] Sync data returned a new top block candidate: 1200 -> 3150000 "
+                          "[Your node is 3148800 blocks (10.9 years) behind]", (TARGET_HEIGHT, 3150000))
+
+    def test_status_line_carries_several_facts(self):
+        self.assertEvents("Height: 3150000/3150000 (100.0%) on mainnet, mining at 850.5 H/s, "
+                          "v16, 12(out)+3(in) connections, uptime 0d 1h 2m 3s",
+                          (HEIGHT, 3150000), (HASH_RATE, '850.5 H/s'), (PEER_COUNT, 15))
+
+    def test_sync_and_mining_state(self):
+        self.assertEvents("I SYNCHRONIZATION started", (SYNC_STATE, 'Synchronizing'))
+        self.assertEvents("I You are now synchronized with the network", (SYNC_STATE, 'Synced'))
+        self.assertEvents("I Mining started with 4 threads", (MINING_STATE, 'Mining active'))
+        self.assertEvents("I Mining has been stopped", (MINING_STATE, 'Mining stopped'))
+
+    def test_peer_changes(self):
+        self.assertEvents("I [5.6.7.8:18080 INC] New connection handshaked", (PEER_CONNECTED, None))
+        self.assertEvents("I [5.6.7.8:18080 INC] Close connection", (PEER_DISCONNECTED, None))
+
+    def test_uninteresting_lines(self):
+        self.assertEvents("I [1.2.3.4:18080 OUT] Requesting callback, 12 blocks queued, span 100-120")
+        self.assertEvents("")
+
+
+class ApplyMonerodEventsTest(unittest.TestCase):
+    def test_sync_lines_move_height_and_target(self):
+        from xmrtor import apply_monerod_events, current_status, update_status
+        update_status(block_height=0, target_height=0)
+        apply_monerod_events(parse_monerod_line("I Synced 1200/3150000 (0%, 3148800 left)"))
+        self.assertEqual((current_status().block_height, current_status().target_height), (1200, 3150000))
+        apply_monerod_events(parse_monerod_line("I Sync data returned a new top block candidate: 1200 -> 3150007"))
+        self.assertEqual(current_status().target_height, 3150007)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""MonerodRpcClient against a local http.server stub standing in for monerod"""
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmrtor import MonerodRpcClient, RpcError
+
+
+class StubMonerod(BaseHTTPRequestHandler):
+    """Answers /json_rpc like monerod; batch arrays only when the server allows them"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(payload)
+        if isinstance(payload, list):
+            if self.server.accept_batch:
+                reply = [self.answer(call) for call in payload]
+            else:
+                reply = {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32600, 'message': 'Invalid Request'}}
+        else:
+            reply = self.answer(payload)
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def answer(self, call):
+        if call['method'] == 'get_info':
+            return {'jsonrpc': '2.0', 'id': call['id'], 'result': {'height': 3150000}}
+        if call['method'] == 'sync_info':
+            return {'jsonrpc': '2.0', 'id': call['id'], 'result': {'target_height': 3150010}}
+        return {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32601, 'message': 'Method not found'}}
+
+    def log_message(self, *args):
+        pass
+
+
+class MonerodRpcClientTest(unittest.TestCase):
+    CALLS = [('get_info', None), ('sync_info', None), ('no_such_method', None)]
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMonerod)
+        self.server.requests = []
+        self.server.accept_batch = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = MonerodRpcClient(f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def check_results(self, results):
+        self.assertEqual(results[0], {'height': 3150000})
+        self.assertEqual(results[1], {'target_height': 3150010})
+        self.assertIsInstance(results[2], RpcError)
+        self.assertIn('Method not found', str(results[2]))
+
+    def test_batch_is_one_round_trip(self):
+        self.check_results(self.client.batch(self.CALLS))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual([call['method'] for call in self.server.requests[0]], [m for m, _ in self.CALLS])
+        self.assertTrue(self.client.batch_supported)
+
+    def test_falls_back_to_sequential_calls(self):
+        self.server.accept_batch = False
+        self.check_results(self.client.batch(self.CALLS))
+        self.assertFalse(self.client.batch_supported)
+        self.assertIsInstance(self.server.requests[0], list)
+        self.assertEqual(len(self.server.requests), 1 + len(self.CALLS))
+        
+        # The rejected array is not retried on later batches
+        self.server.requests.clear()
+        self.check_results(self.client.batch(self.CALLS))
+        self.assertEqual(len(self.server.requests), len(self.CALLS))
+        self.assertTrue(all(isinstance(payload, dict) for payload in self.server.requests))
+
+    def test_latency_stats(self):
+        self.client.batch(self.CALLS)
+        self.client.call('get_info')
+        stats = self.client.latency_stats()
+        self.assertEqual(stats['get_info']['calls'], 2)
+        self.assertEqual(stats['get_info']['errors'], 0)
+        self.assertEqual(stats['no_such_method'], dict(stats['no_such_method'], calls=1, errors=1))
+        for method in stats.values():
+            self.assertGreaterEqual(method['max_ms'], method['avg_ms'])
+            self.assertGreater(method['last_ms'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""RpcProxy: per-height caching, coalescing, the whitelist and per-circuit limits"""
+import concurrent.futures
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import xmrtor
+from xmrtor import (RPC_PROXY_CLIENT_CONCURRENCY, ProxyReply, RpcProxy, core, current_status, log_archives, status_store,
+                    update_status)
+
+archive_dir = None
+
+def setUpModule():
+    # The proxy logs through log_message; keep its archive out of the working directory
+    global archive_dir
+    archive_dir = tempfile.mkdtemp()
+    for service, archive in log_archives.items():
+        archive.directory = os.path.join(archive_dir, service)
+
+def tearDownModule():
+    for archive in log_archives.values():
+        archive.flush()
+    shutil.rmtree(archive_dir, ignore_errors=True)
+
+
+class StubRestrictedRpc(BaseHTTPRequestHandler):
+    """Slow enough that concurrent requests overlap in the proxy"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.calls.append(self.path)
+        time.sleep(0.3)
+        if self.path == '/json_rpc':
+            call = json.loads(body)
+            reply = {'jsonrpc': '2.0', 'id': call['id'], 'result': {'count': current_status().block_height}}
+        else:
+            reply = {'height': current_status().block_height, 'status': 'OK'}
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class RpcProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.upstream = ThreadingHTTPServer(('127.0.0.1', 0), StubRestrictedRpc)
+        self.upstream.calls = []
+        threading.Thread(target=self.upstream.serve_forever, daemon=True).start()
+        self.proxy = RpcProxy(f'http://127.0.0.1:{self.upstream.server_port}', 0)
+        self.unsubscribe = status_store.subscribe(self.proxy.on_status)
+        core.run(self.proxy.start())
+        self.url = f'http://127.0.0.1:{self.proxy.server.sockets[0].getsockname()[1]}'
+        update_status(block_height=1000)
+
+    def tearDown(self):
+        self.unsubscribe()
+        core.call_soon(self.proxy.stop)
+        self.upstream.shutdown()
+        self.upstream.server_close()
+
+    def rpc(self, request_id, method='get_block_count'):
+        return requests.post(self.url + '/json_rpc', json={'jsonrpc': '2.0', 'id': request_id, 'method': method})
+
+    def parallel(self, func, count):
+        with concurrent.futures.ThreadPoolExecutor(count) as pool:
+            return list(pool.map(func, range(count)))
+
+    def test_coalesces_and_caches_per_height(self):
+        replies = self.parallel(lambda n: self.rpc(f'wallet-{n}').json(), 3)
+        self.assertEqual([reply['id'] for reply in replies], ['wallet-0', 'wallet-1', 'wallet-2'])
+        self.assertTrue(all(reply['result'] == {'count': 1000} for reply in replies))
+        self.assertEqual(len(self.upstream.calls), 1)
+        
+        self.assertEqual(self.rpc('again').json()['result'], {'count': 1000})
+        self.assertEqual(len(self.upstream.calls), 1)
+        
+        update_status(block_height=1001)
+        time.sleep(0.1)  # The invalidation is handed to the core loop
+        self.assertEqual(self.rpc('new-block').json()['result'], {'count': 1001})
+        self.assertEqual(len(self.upstream.calls), 2)
+
+    def test_bulk_sync_replies_are_not_cached(self):
+        for _ in range(2):
+            requests.post(self.url + '/getblocks.bin', data=b'wallet sync request')
+        self.assertEqual(self.upstream.calls, ['/getblocks.bin', '/getblocks.bin'])
+        self.assertEqual(self.proxy.cache, {})
+
+    def test_cache_stays_within_byte_budget(self):
+        self.proxy.height = 1000
+        with mock.patch.object(xmrtor, 'RPC_PROXY_CACHE_BYTES', 1600):
+            for n in range(5):
+                self.proxy._store(('/get_info', n), 1000, ProxyReply(200, 'application/json', b'x' * 100))
+            self.proxy._store(('/get_info', 'huge'), 1000, ProxyReply(200, 'application/json', b'x' * 500))
+            self.assertEqual(self.proxy.cache_bytes, 1600 // 16 * 5)
+            self.assertNotIn(('/get_info', 'huge'), self.proxy.cache)
+        with mock.patch.object(xmrtor, 'RPC_PROXY_CACHE_BYTES', 3200):
+            for n in range(5, 40):
+                self.proxy._store(('/get_info', n), 1000, ProxyReply(200, 'application/json', b'x' * 200))
+            self.assertLessEqual(self.proxy.cache_bytes, 3200)
+            self.assertIn(('/get_info', 39), self.proxy.cache)
+            self.assertNotIn(('/get_info', 0), self.proxy.cache)
+
+    def test_refuses_unrestricted_methods_and_paths(self):
+        self.assertEqual(self.rpc(1, method='set_bans').status_code, 403)
+        self.assertEqual(requests.post(self.url + '/stop_daemon', data=b'{}').status_code, 403)
+        self.assertEqual(self.upstream.calls, [])
+
+    def test_limits_requests_per_circuit(self):
+        def send(n, circuit='fc00:dead:beef:4dad::0:7'):
+            body = json.dumps({'txs_hashes': [str(n)]}).encode()
+            with socket.create_connection(('127.0.0.1', int(self.url.rsplit(':', 1)[1])), timeout=10) as s:
+                s.sendall(f'PROXY TCP6 {circuit} ::1 65535 18081\r\n'.encode() +
+                          b'POST /get_transactions HTTP/1.1\r\nConnection: close\r\n' +
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+                return s.recv(4096).split(b' ')[1]
+        
+        statuses = self.parallel(send, RPC_PROXY_CLIENT_CONCURRENCY + 2)
+        self.assertEqual(statuses.count(b'200'), RPC_PROXY_CLIENT_CONCURRENCY)
+        self.assertEqual(statuses.count(b'429'), 2)
+        self.assertEqual(self.proxy.clients, {})
+
+    def test_upstream_failure_releases_coalesced_waiters(self):
+        def fail(*args):
+            time.sleep(0.3)
+            raise RuntimeError('upstream exploded')
+        self.proxy._forward = fail
+        statuses = self.parallel(lambda n: requests.post(self.url + '/get_height', data=b'{}').status_code, 3)
+        self.assertEqual(statuses, [502, 502, 502])
+        self.assertEqual(self.proxy.inflight, {})
+        self.assertEqual(self.proxy.clients, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
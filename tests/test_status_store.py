@@ -0,0 +1,86 @@
+"""StatusStore: copy-on-write updates, change notification and field checks"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xmrtor import StatusSnapshot, StatusStore
+
+
+class StatusStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = StatusStore(StatusSnapshot())
+        self.seen = []
+        self.store.subscribe(lambda snapshot, changed: self.seen.append((snapshot.version, changed)))
+
+    def test_update_publishes_new_snapshot(self):
+        before = self.store.snapshot()
+        after = self.store.update(block_height=10, connections=3)
+        self.assertIsNot(before, after)
+        self.assertEqual(before.block_height, 0)
+        self.assertEqual((after.block_height, after.connections), (10, 3))
+        self.assertEqual(after.version, before.version + 1)
+        self.assertEqual(self.seen, [(after.version, {'block_height': 10, 'connections': 3})])
+
+    def test_unchanged_values_are_a_no_op(self):
+        snapshot = self.store.update(block_height=10)
+        self.assertIs(self.store.update(block_height=10), snapshot)
+        self.assertEqual(self.store.update(block_height=10, connections=2).version, snapshot.version + 1)
+        self.assertEqual(self.seen[-1][1], {'connections': 2})
+
+    def test_modify_computes_from_current_snapshot(self):
+        self.store.update(connections=2)
+        self.store.modify(lambda snapshot: {'connections': snapshot.connections + 1})
+        self.assertEqual(self.store.snapshot().connections, 3)
+
+    def test_unknown_field_raises_type_error(self):
+        with self.assertRaises(TypeError):
+            self.store.update(bogus=1)
+        self.assertEqual(self.store.snapshot().version, StatusSnapshot().version)
+        self.assertEqual(self.seen, [])
+
+    def test_notifications_arrive_in_version_order(self):
+        first_delivery = threading.Event()
+        release = threading.Event()
+        
+        def slow(snapshot, changed):
+            if snapshot.block_height == 1:
+                first_delivery.set()
+                release.wait(5)
+        self.store.subscribe(slow)
+        
+        writer = threading.Thread(target=self.store.update, kwargs={'block_height': 1})
+        writer.start()
+        first_delivery.wait(5)
+        # A second writer while the first is still notifying: queued, delivered after it
+        self.store.update(block_height=2)
+        self.assertEqual([changed for _, changed in self.seen], [{'block_height': 1}])
+        release.set()
+        writer.join(5)
+        self.assertEqual([changed['block_height'] for _, changed in self.seen], [1, 2])
+        versions = [version for version, _ in self.seen]
+        self.assertEqual(versions, sorted(versions))
+
+    def test_update_from_a_subscriber_is_delivered_after_the_current_one(self):
+        order = []
+        
+        def cascade(snapshot, changed):
+            order.append(dict(changed))
+            if 'block_height' in changed:
+                self.store.update(target_height=snapshot.block_height + 5)
+                order.append('returned')
+        self.store.subscribe(cascade)
+        self.store.update(block_height=10)
+        self.assertEqual(order, [{'block_height': 10}, 'returned', {'target_height': 15}])
+        self.assertEqual(self.store.snapshot().target_height, 15)
+
+    def test_unsubscribe(self):
+        unsubscribe = self.store.subscribe(lambda snapshot, changed: self.fail('still subscribed'))
+        unsubscribe()
+        self.store.update(block_height=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,50 @@
 import os
+import sys
+import io
+import select
+import socket
+import ctypes
+import ctypes.util
 import subprocess
 import threading
 import time
 import json
+import queue
+import asyncio
+import concurrent.futures
 import re
 import hashlib
+import gzip
+import mmap
+import zlib
 import getpass
+import signal
+import bisect
+from array import array
+from collections import namedtuple
+from dataclasses import dataclass, fields, replace
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
-from werkzeug.serving import make_server
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qs
+from flask import Flask, Response, g, render_template, jsonify, request, session, redirect, url_for
+from itsdangerous import BadSignature
+from werkzeug.serving import WSGIRequestHandler, make_server
 import requests
+from requests.adapters import HTTPAdapter
+from monerod_log import (HASH_RATE, HEIGHT, MINING_STATE, PEER_CONNECTED, PEER_COUNT, PEER_DISCONNECTED,
+                         SYNC_STATE, TARGET_HEIGHT, parse_monerod_line)
+
+try:
+    # Optional: when installed the dashboard runs as ASGI on the core loop,
+    # otherwise it falls back to Werkzeug's thread-per-request server
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+try:
+    import brotli  # Optional: smaller dashboard pages for browsers that accept br
+except ImportError:
+    brotli = None
 
 # ========== Security Functions ==========
 def hash_password(password):
@@ -42,43 +77,743 @@ def get_secure_password():
 # ========== Configuration ==========
 BASE_DIR = os.getcwd()
 TOR_EXE = os.path.join(BASE_DIR, "tor.exe")
-TOR_DATA_DIR = os.path.join(BASE_DIR, "tor_data")
+HIDDEN_SERVICE_DIR = os.path.join(BASE_DIR, "tor_data")  # Dashboard onion keys; the original onion
+RPC_HIDDEN_SERVICE_DIR = os.path.join(BASE_DIR, "tor_rpc")  # Restricted RPC onion for remote wallets
+P2P_HIDDEN_SERVICE_DIR = os.path.join(BASE_DIR, "tor_p2p")  # monerod's anonymous-inbound onion
+TOR_DATA_DIR = os.path.join(BASE_DIR, "tor_state")  # Tor's DataDirectory: consensus cache, guards
+TOR_BOOTSTRAP_HISTORY = os.path.join(TOR_DATA_DIR, "launcher-bootstrap.json")
 TORRC_PATH = os.path.join(BASE_DIR, "torrc")
 MONEROD_EXE = os.path.join(BASE_DIR, "monerod.exe")
-HOSTNAME_PATH = os.path.join(TOR_DATA_DIR, "hostname")
+HOSTNAME_PATH = os.path.join(HIDDEN_SERVICE_DIR, "hostname")
+RPC_HOSTNAME_PATH = os.path.join(RPC_HIDDEN_SERVICE_DIR, "hostname")
+P2P_HOSTNAME_PATH = os.path.join(P2P_HIDDEN_SERVICE_DIR, "hostname")
+# Bundled with the script (or unpacked next to a PyInstaller build), not under the working directory
+TEMPLATE_DIR = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), "templates")
+LOG_ARCHIVE_DIR = os.path.join(BASE_DIR, "logs")
+SETTINGS_PATH = os.path.join(BASE_DIR, "launcher_settings.json")
+TOR_COOKIE_PATH = os.path.join(BASE_DIR, "tor_control_auth_cookie")
 SOCKS_PORT = 9050
-HIDDEN_SERVICE_PORT = 18081
+CONTROL_PORT = 9051
+HIDDEN_SERVICE_PORT = 18081  # Restricted RPC, on the RPC onion
 HIDDEN_SERVICE_WEB_PORT = 80
-LOCAL_PORT = 18081
+HIDDEN_SERVICE_P2P_PORT = 18083  # Inbound peers, on the P2P onion
+LOCAL_PORT = 18081  # monerod's full RPC, for the launcher only and never published
+MONEROD_P2P_PORT = 18080
+MONEROD_RESTRICTED_RPC_PORT = 18089
+RPC_PROXY_PORT = 18090  # Caching front for the restricted RPC; the RPC onion points here
+MONEROD_ANONYMOUS_INBOUND_PORT = 18083
+ANONYMOUS_INBOUND_CONNECTIONS = 32
+TX_PROXY_CONNECTIONS = 16
 WEB_PORT = 8080
+METRICS_PORT = 9109  # Loopback only and not mapped into the hidden service
+TOR_POOL_FRONT_PORT = 9049  # Round-robin SOCKS front monerod uses when the pool is enabled
+TOR_POOL_SOCKS_BASE = 9060  # Extra instance i listens on SOCKS base + i and control base + i
+TOR_POOL_CONTROL_BASE = 9160
+TOR_POOL_MAX = 8
+RPC_PROXY_CACHE_TTL = 30  # Upper bound on a cached reply's age even if no new block is seen
+RPC_PROXY_CACHE_ENTRIES = 1024
+RPC_PROXY_CACHE_BYTES = 8 * 1024 * 1024  # Budget for cached reply bodies; oldest entries go first
+RPC_PROXY_CLIENT_CONCURRENCY = 4  # In-flight requests per onion circuit before 429
+RPC_PROXY_UPSTREAM_CONCURRENCY = 8  # Requests the proxy lets reach monerod at once
+RPC_PROXY_CLIENT_CONNECTIONS = 8  # Open connections per onion circuit
+RPC_PROXY_MAX_BODY = 1024 * 1024
+RPC_PROXY_MAX_HEADERS = 64
+RPC_PROXY_MAX_HEADER_BYTES = 16384
+RPC_PROXY_HEADER_TIMEOUT = 10  # Seconds to send a request's headers once its first line arrived
+RPC_PROXY_IDLE_TIMEOUT = 60
+RPC_PROXY_UPSTREAM_TIMEOUT = 60
+RPC_TIMEOUT = 5
+RPC_POLL_MIN_INTERVAL = 2  # Seconds between polls while syncing or height moves
+RPC_POLL_MAX_INTERVAL = 60  # Ceiling for backoff when synced or RPC keeps failing
+RPC_POLL_BACKOFF = 2
+ONION_ADDRESS_TIMEOUT = 60
+TOR_BOOTSTRAP_TIMEOUT = 300
+TOR_CONSENSUS_LIVE = 24 * 3600  # Tor still bootstraps from a consensus this old
+SOCKS_READY_TIMEOUT = 30
+TOR_CONTROL_TIMEOUT = 30
+HIDDEN_SERVICE_PUBLISH_TIMEOUT = 180
+MONEROD_RPC_TIMEOUT = 600  # Opening a large LMDB can take a while
+RESTART_BACKOFF_INITIAL = 1  # Seconds before the first restart after a crash
+RESTART_BACKOFF_MAX = 60
+RESTART_STABLE_AFTER = 300  # A run this long forgets earlier crashes
+CRASH_LOOP_LIMIT = 5  # Crashes within CRASH_LOOP_WINDOW before giving up
+CRASH_LOOP_WINDOW = 600
+PROCESS_STOP_TIMEOUT = 30  # Seconds a child gets to exit before it is killed
+MONEROD_STOP_TIMEOUT = 120  # Seconds for stop_daemon to flush LMDB and exit
+TOR_STOP_TIMEOUT = 10
+LOG_BUFFER_CAPACITY = 500
+LOG_TAIL_LINES = 100
+PIPE_READ_SIZE = 65536  # Bytes read from a child's stdout per wakeup
+LOG_POLL_MAX_WAIT = 25  # Seconds a long-poll request may block
+STREAM_HEARTBEAT = 15  # Seconds between SSE keep-alive comments
+DASHBOARD_THREADS = 16  # Flask routes served at once under uvicorn, like Werkzeug's thread per request
+STREAM_RETRY_MS = 3000
+LOG_ARCHIVE_FLUSH_INTERVAL = 1.0  # Seconds between archive writes
+LOG_ARCHIVE_SEGMENT_BYTES = 4 * 1024 * 1024  # Compressed size before rotating
+LOG_ARCHIVE_SEGMENTS = 64  # Segments kept per service
+LOG_SEARCH_LIMIT = 1000
+# (seconds per sample, samples kept): 1 hour at 1 s, 2 days at 1 min, 90 days at 1 h
+METRICS_TIERS = ((1, 3600), (60, 2880), (3600, 2160))
+METRICS_DEFAULT_RANGE = 3600
+
+# ========== Log Buffer ==========
+class LogBuffer:
+    """Fixed-capacity ring buffer of log lines with sequence numbers.
+
+    Every appended entry gets a monotonically increasing sequence number
+    (starting at 1), so readers can ask for everything after the last
+    entry they saw. Appends are O(1) and reuse the preallocated slots.
+    """
+
+    def __init__(self, capacity=LOG_BUFFER_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._entries = [None] * capacity
+        self._next_seq = 1
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def last_seq(self):
+        """Sequence number of the newest entry (0 if empty)"""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest entry still held (0 if empty)"""
+        if self._next_seq == 1:
+            return 0
+        return max(1, self._next_seq - self.capacity)
+
+    def append(self, line):
+        """Store a line and return its sequence number"""
+        with self._lock:
+            seq = self._next_seq
+            self._entries[seq % self.capacity] = (seq, line)
+            self._next_seq = seq + 1
+            self._changed.notify_all()
+        return seq
+
+    def extend(self, lines):
+        """Store several lines under one lock acquisition; returns the last seq"""
+        with self._lock:
+            seq = self._next_seq
+            for line in lines:
+                self._entries[seq % self.capacity] = (seq, line)
+                seq += 1
+            self._next_seq = seq
+            self._changed.notify_all()
+        return seq - 1
+
+    def wait_for(self, seq, timeout):
+        """Block until an entry newer than seq exists or timeout expires"""
+        with self._lock:
+            return self._changed.wait_for(lambda: self._next_seq - 1 > seq, timeout)
+
+    def since(self, seq=0, limit=None):
+        """Return (seq, line) entries newer than seq, oldest first"""
+        with self._lock:
+            last = self._next_seq - 1
+            first = max(seq + 1, self._next_seq - self.capacity, 1)
+            if limit is not None:
+                first = max(first, last - limit + 1)
+            return [self._entries[i % self.capacity] for i in range(first, last + 1)]
+
+    def tail(self, count):
+        """Return the last count (seq, line) entries, oldest first"""
+        return self.since(0, limit=count)
+
+    def __len__(self):
+        return min(self._next_seq - 1, self.capacity)
+
+# ========== Log Archive ==========
+ArchiveMember = namedtuple('ArchiveMember', 'offset length first_seq last_seq first_ts last_ts')
+ArchivedLine = namedtuple('ArchivedLine', 'seq ts line')
+
+class LogSegment:
+    def __init__(self, path, members=None):
+        self.path = path
+        self.index_path = path[:-len('.log.gz')] + '.idx'
+        self.members = members or []
+        self.torn = False
+
+    @staticmethod
+    def index_line(entry):
+        return (f"{entry.offset} {entry.length} {entry.first_seq} {entry.last_seq} "
+                f"{entry.first_ts:.3f} {entry.last_ts:.3f}\n")
+
+    @property
+    def size(self):
+        return self.members[-1].offset + self.members[-1].length if self.members else 0
+
+    @classmethod
+    def load(cls, path):
+        segment = cls(path)
+        try:
+            with open(segment.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 6 or not line.endswith('\n'):
+                        segment.torn = True
+                        break
+                    segment.members.append(ArchiveMember(
+                        int(parts[0]), int(parts[1]), int(parts[2]), int(parts[3]),
+                        float(parts[4]), float(parts[5])))
+        except (OSError, ValueError):
+            pass
+        return segment
+
+
+class LogArchive:
+    """Append-only, compressed, segment-rotated on-disk log for one service.
+
+    Lines are queued by append() (O(1), no I/O on the ingestion path) and a
+    writer thread flushes them every LOG_ARCHIVE_FLUSH_INTERVAL as one gzip
+    member. Each segment file has a small .idx sidecar with the offset,
+    sequence and time range of every member, so search() only decompresses
+    the members that can match, straight from a memory map of the segment.
+    Sequence numbers continue across launcher restarts.
+    """
+
+    def __init__(self, directory, segment_bytes=LOG_ARCHIVE_SEGMENT_BYTES, max_segments=LOG_ARCHIVE_SEGMENTS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.segments = None  # Loaded on first use
+        self.next_seq = 1
+        self._pending = []
+        self._lock = threading.Lock()  # Guards _pending only, so appends never wait on disk
+        self._write_lock = threading.Lock()
+        self._writer = None
+
+    def append(self, lines, ts=None):
+        """Queue lines for archiving, stamped with ts (epoch seconds)"""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._pending.append((ts, lines))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer.start()
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            self._load()
+            data = []
+            first_seq, seq = self.next_seq, self.next_seq
+            for ts, lines in pending:
+                for line in lines:
+                    data.append(f"{seq}\t{ts:.3f}\t{line}\n")
+                    seq += 1
+            member = gzip.compress(''.join(data).encode('utf-8'), compresslevel=6)
+            
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or segment.size + len(member) > self.segment_bytes:
+                segment = self._rotate(first_seq)
+            with open(segment.path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)  # The real end, even if the index is behind the data
+                f.write(member)
+            entry = ArchiveMember(offset, len(member), first_seq, seq - 1, pending[0][0], pending[-1][0])
+            with open(segment.index_path, "a", encoding="utf-8") as f:
+                f.write(LogSegment.index_line(entry))
+            segment.members.append(entry)
+            self.next_seq = seq
+
+    def search(self, start=None, end=None, after_seq=0, contains=None, pattern=None, limit=LOG_SEARCH_LIMIT):
+        """Return up to limit ArchivedLines, oldest first, matching every given filter"""
+        with self._write_lock:
+            self._load()
+            segments = [LogSegment(segment.path, list(segment.members)) for segment in self.segments]
+        
+        results = []
+        for segment in segments:
+            members = [
+                m for m in segment.members
+                if m.last_seq > after_seq and (start is None or m.last_ts >= start) and (end is None or m.first_ts <= end)
+            ]
+            if not members:
+                continue
+            try:
+                with open(segment.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    for member in members:
+                        data = zlib.decompress(view[member.offset:member.offset + member.length], 16 + zlib.MAX_WBITS)
+                        for raw in data.decode('utf-8', errors='replace').splitlines():
+                            seq, ts, line = raw.split('\t', 2)
+                            seq, ts = int(seq), float(ts)
+                            if seq <= after_seq or (start is not None and ts < start) or (end is not None and ts > end):
+                                continue
+                            if contains is not None and contains not in line:
+                                continue
+                            if pattern is not None and not pattern.search(line):
+                                continue
+                            results.append(ArchivedLine(seq, ts, line))
+                            if len(results) >= limit:
+                                return results
+            except (OSError, ValueError, zlib.error):
+                continue  # Segment removed by rotation or damaged; skip it
+        return results
+
+    def _write_loop(self):
+        while True:
+            time.sleep(LOG_ARCHIVE_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Log archive write failed: {e}")
+
+    def _load(self):
+        if self.segments is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.log.gz'))
+        self.segments = [LogSegment.load(os.path.join(self.directory, name)) for name in names]
+        for segment in reversed(self.segments):
+            if segment.members:
+                self.next_seq = segment.members[-1].last_seq + 1
+                break
+        if self.segments:
+            # A crash between writing a member and its index line leaves unindexed bytes
+            # or a partial index line; drop them so later offsets stay right
+            last = self.segments[-1]
+            try:
+                if last.torn:
+                    with open(last.index_path, "w", encoding="utf-8") as f:
+                        f.writelines(LogSegment.index_line(entry) for entry in last.members)
+                if os.path.getsize(last.path) > last.size:
+                    with open(last.path, "r+b") as f:
+                        f.truncate(last.size)
+            except OSError:
+                pass
+
+    def _rotate(self, first_seq):
+        segment = LogSegment(os.path.join(self.directory, f"{first_seq:012d}.log.gz"))
+        self.segments.append(segment)
+        while len(self.segments) > self.max_segments:
+            old = self.segments.pop(0)
+            for path in (old.path, old.index_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return segment
+
+# ========== Status Snapshot ==========
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """Immutable view of the scalar status fields at one status version"""
+    version: int = 0
+    tor_running: bool = False
+    monerod_running: bool = False
+    onion_address: str = 'Waiting...'
+    rpc_onion_address: str = 'Waiting...'
+    p2p_onion_address: str = 'Waiting...'
+    status: str = 'Ready'
+    block_height: int = 0
+    sync_status: str = 'Not synced'
+    mining_status: str = 'Not mining'
+    hash_rate: str = '0 H/s'
+    connections: int = 0
+    target_height: int = 0
+    hard_fork_version: int = 0
+    rpc_poll_interval: float = RPC_POLL_MIN_INTERVAL
+    tor_bootstrap: int = 0
+    tor_cache: str = ''
+    tor_bootstrap_seconds: float = 0.0
+    tor_circuits: int = 0
+    startup_phases: tuple = ()
+    service_state: str = 'stopped'
+    tor_restarts: int = 0
+    monerod_restarts: int = 0
+    last_exit: str = ''
+    monerod_profile: str = ''
+    monerod_command: str = ''
+
+    def to_dict(self):
+        """JSON payload for the API, with uptime computed at call time"""
+        data = {field.name: getattr(self, field.name) for field in fields(self)}
+        data['startup_phases'] = [phase._asdict() for phase in self.startup_phases]
+        data['uptime'] = current_uptime() if self.monerod_running else '00:00:00'
+        return data
+
+
+class StatusStore:
+    """Copy-on-write holder of the current StatusSnapshot.
+
+    Writers build a new frozen snapshot with the next version number and
+    publish it with a single reference assignment, so readers never lock
+    and never see a half-applied update. A lock only serialises writers.
+    Subscribers are called with (snapshot, changed_fields) after every
+    effective change, outside the writer lock and always in version order:
+    changes are queued under the lock and one writer at a time delivers
+    the queue, including changes other writers queued meanwhile.
+    """
+
+    def __init__(self, initial):
+        self._snapshot = initial
+        self._fields = frozenset(field.name for field in fields(initial))
+        self._subscribers = ()
+        self._write_lock = threading.Lock()
+        self._undelivered = []
+        self._delivering = False
+
+    def snapshot(self):
+        return self._snapshot
+
+    def update(self, **changes):
+        """Publish a snapshot with changes applied; no-op if nothing differs"""
+        return self.modify(lambda snapshot: changes)
+
+    def modify(self, compute):
+        """Like update(), with changes computed from the current snapshot under the writer lock.
+
+        Raises TypeError for a field StatusSnapshot does not have.
+        """
+        with self._write_lock:
+            current = self._snapshot
+            changes = compute(current)
+            unknown = changes.keys() - self._fields
+            if unknown:
+                raise TypeError(f"Unknown status field(s): {', '.join(sorted(unknown))}")
+            changed = {key: value for key, value in changes.items() if getattr(current, key) != value}
+            if not changed:
+                return current
+            snapshot = replace(current, version=current.version + 1, **changed)
+            self._snapshot = snapshot
+            self._undelivered.append((snapshot, changed, self._subscribers))
+            if self._delivering:
+                return snapshot  # The delivering writer (maybe this thread, one level up) sends it in turn
+            self._delivering = True
+        self._deliver()
+        return snapshot
+
+    def _deliver(self):
+        try:
+            while True:
+                with self._write_lock:
+                    if not self._undelivered:
+                        self._delivering = False
+                        return
+                    snapshot, changed, subscribers = self._undelivered.pop(0)
+                for callback in subscribers:
+                    callback(snapshot, changed)
+        except BaseException:
+            with self._write_lock:
+                self._delivering = False  # The next writer picks up whatever is left
+            raise
+
+    def subscribe(self, callback):
+        """Register callback(snapshot, changed_fields); returns an unsubscribe function"""
+        with self._write_lock:
+            self._subscribers = self._subscribers + (callback,)
+        
+        def unsubscribe():
+            with self._write_lock:
+                self._subscribers = tuple(cb for cb in self._subscribers if cb is not callback)
+        return unsubscribe
+
+
+# ========== Metrics History ==========
+class SeriesTier:
+    """One fixed-size ring of time buckets, stored in flat typed arrays"""
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.buckets = array('q', [-1]) * size
+        self.sums = array('d', [0.0]) * size
+        self.counts = array('L', [0]) * size
+        self.lasts = array('d', [0.0]) * size
+
+    @property
+    def span(self):
+        return self.step * self.size
+
+    def add(self, ts, value):
+        bucket = int(ts // self.step)
+        slot = bucket % self.size
+        if self.buckets[slot] != bucket:
+            if self.buckets[slot] > bucket:
+                return  # Older than the retained window
+            self.buckets[slot] = bucket
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        self.sums[slot] += value
+        self.counts[slot] += 1
+        self.lasts[slot] = value
+
+    def points(self, start, end, use_last):
+        first, last = int(start // self.step), int(end // self.step)
+        first = max(first, last - self.size + 1)
+        points = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.size
+            if self.buckets[slot] == bucket:
+                value = self.lasts[slot] if use_last else self.sums[slot] / self.counts[slot]
+                points.append((bucket * self.step, value))
+        return points
+
+
+class MetricsHistory:
+    """Bounded in-process time series for charting.
+
+    Every sample is folded into each tier of METRICS_TIERS, so memory is
+    fixed at start-up no matter how long the launcher runs, and a range
+    query is answered from the finest tier that still covers it. Gauges
+    listed in LAST_VALUE keep the last sample of a bucket instead of the
+    mean, which is what rates such as blocks/s are derived from.
+    """
+
+    LAST_VALUE = ('height',)
+    DERIVED = {'sync_rate': 'height'}  # Per-second rate of another series
+
+    def __init__(self, names, tiers=METRICS_TIERS):
+        self.tiers = tiers
+        self._series = {name: [SeriesTier(step, size) for step, size in tiers] for name in names}
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return tuple(self._series) + tuple(self.DERIVED)
+
+    def record(self, name, value, ts=None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for tier in self._series[name]:
+                tier.add(ts, value)
+
+    def query(self, names, start, end):
+        """Return (step, {name: [(ts, value), ...]}) for start..end"""
+        index = next((i for i, (step, size) in enumerate(self.tiers) if end - start <= step * size
+                      and start >= time.time() - step * size), len(self.tiers) - 1)
+        result = {}
+        with self._lock:
+            for name in names:
+                source = self.DERIVED.get(name, name)
+                points = self._series[source][index].points(start, end, source in self.LAST_VALUE)
+                result[name] = rate_of(points) if name in self.DERIVED else points
+        return self.tiers[index][0], result
+
+
+def rate_of(points):
+    """Per-second change between consecutive points"""
+    return [(t, max(0.0, (v - pv) / (t - pt))) for (pt, pv), (t, v) in zip(points, points[1:])]
+
+
+metrics_history = MetricsHistory(('height', 'target_height', 'peers', 'tor_read_bps', 'tor_written_bps'))
+
+def record_status_metrics(snapshot, changed):
+    """Sample the chartable status fields whenever RPC polling or the log parser moves them"""
+    now = time.time()
+    if 'block_height' in changed and snapshot.block_height:
+        metrics_history.record('height', snapshot.block_height, now)
+    if 'target_height' in changed and snapshot.target_height:
+        metrics_history.record('target_height', snapshot.target_height, now)
+    if 'connections' in changed:
+        metrics_history.record('peers', snapshot.connections, now)
+
+# ========== Instrumentation ==========
+class Counter:
+    """Monotonic counter with optional labels, exported in Prometheus text format"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, list(zip(self.labels, labels)), value) for labels, value in self._values.items()]
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram; observe() costs one bisect and a lock"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value, labels=(), count=1):
+        """Record value count times (count > 1 for a batch of equal samples)"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += count
+            entry[1] += value * count
+            entry[2] += count
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, (counts, total, count) in self._values.items():
+                labels = list(zip(self.labels, labels))
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    samples.append((f"{self.name}_bucket", labels + [('le', le)], cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Gauge:
+    """Value read at scrape time from a callback returning [(labels, value)]"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.read = read
+
+    def samples(self):
+        return [(self.name, list(zip(self.labels, labels)), value) for labels, value in self.read()]
+
+
+def format_sample(name, labels, value):
+    if not labels:
+        return f"{name} {value}"
+    rendered = ','.join(
+        '{}="{}"'.format(key, str(val).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, val in labels
+    )
+    return f"{name}{{{rendered}}} {value}"
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(format_sample(name, labels, value) for name, labels, value in metric.samples())
+    return '\n'.join(lines) + '\n'
+
+def metrics_wsgi(environ, start_response):
+    """Bare WSGI app for the unauthenticated loopback scrape port"""
+    if environ.get('PATH_INFO') != '/metrics':
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b'Not found\n']
+    body = render_metrics().encode('utf-8')
+    start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                              ('Content-Length', str(len(body)))])
+    return [body]
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Scrapes arrive every few seconds; keep them out of the console"""
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+def status_gauge(read):
+    return lambda: [((), read(current_status()))]
+
+LOG_LINES = Counter('xmrtor_log_lines_total', 'Log lines ingested from child processes', ('service',))
+LOG_PARSE_SECONDS = Histogram('xmrtor_log_parse_seconds', 'monerod log parse time per line (batch average)',
+                              buckets=(1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 1e-3))
+RPC_LATENCY = Histogram('xmrtor_rpc_request_seconds', 'monerod JSON-RPC latency per method', ('method',))
+RPC_ERRORS = Counter('xmrtor_rpc_errors_total', 'monerod JSON-RPC failures', ('method',))
+RPC_POLL_ERRORS = Counter('xmrtor_rpc_poll_errors_total', 'Failed status polls by cause', ('cause',))
+HTTP_LATENCY = Histogram('xmrtor_http_request_seconds', 'Dashboard request latency per route', ('route', 'method'))
+PROCESS_STARTS = Counter('xmrtor_process_starts_total', 'Child processes launched', ('service',))
+PROCESS_RESTARTS = Counter('xmrtor_process_restarts_total', 'Automatic restarts after a crash', ('service',))
+RPC_PROXY_REQUESTS = Counter('xmrtor_rpc_proxy_requests_total', 'Onion RPC proxy requests by outcome', ('outcome',))
+
+METRICS = [
+    LOG_LINES, LOG_PARSE_SECONDS, RPC_LATENCY, RPC_ERRORS, RPC_POLL_ERRORS, HTTP_LATENCY,
+    PROCESS_STARTS, PROCESS_RESTARTS, RPC_PROXY_REQUESTS,
+    Gauge('xmrtor_up', 'Whether a child process is running', lambda: [
+        (('tor',), int(current_status().tor_running)), (('monerod',), int(current_status().monerod_running))
+    ], ('service',)),
+    Gauge('xmrtor_block_height', 'Local blockchain height', status_gauge(lambda s: s.block_height)),
+    Gauge('xmrtor_target_height', 'Network height reported by peers', status_gauge(lambda s: s.target_height)),
+    Gauge('xmrtor_sync_gap_blocks', 'Blocks still to download', status_gauge(
+        lambda s: max(0, s.target_height - s.block_height) if s.target_height else 0)),
+    Gauge('xmrtor_peers', 'monerod peer connections', status_gauge(lambda s: s.connections)),
+    Gauge('xmrtor_tor_bootstrap_percent', 'Tor bootstrap progress', status_gauge(lambda s: s.tor_bootstrap)),
+    Gauge('xmrtor_tor_circuits', 'Open Tor circuits', status_gauge(lambda s: s.tor_circuits)),
+]
 
 
 tor_process = None
 monerod_process = None
 web_server = None
 server_thread = None
+metrics_server = None
 master_password = None 
-app_status = {
-    'tor_running': False,
-    'monerod_running': False,
-    'onion_address': 'Waiting...',
-    'status': 'Ready',
-    'tor_logs': [],
-    'monerod_logs': [],
-    'block_height': 0,
-    'sync_status': 'Not synced',
-    'mining_status': 'Not mining',
-    'hash_rate': '0 H/s',
-    'connections': 0,
-    'uptime': '00:00:00'
-}
+status_store = StatusStore(StatusSnapshot())
 
 start_time = None
+log_buffers = {
+    'tor': LogBuffer(),
+    'monerod': LogBuffer()
+}
+log_archives = {service: LogArchive(os.path.join(LOG_ARCHIVE_DIR, service)) for service in log_buffers}
+
+# Bumped and broadcast whenever status or logs change, for stream listeners
+updates = threading.Condition()
+update_version = 0
+
+def notify_updates():
+    """Wake every /api/stream listener"""
+    global update_version
+    with updates:
+        update_version += 1
+        updates.notify_all()
+    core.notify()
 
+status_store.subscribe(lambda snapshot, changed: notify_updates())
+status_store.subscribe(record_status_metrics)
 
-app = Flask(__name__)
+# Distinguishes ETags across launcher restarts, where the version restarts at 0
+STATUS_EPOCH = os.urandom(4).hex()
+
+def update_status(**changes):
+    """Publish status field changes; listeners are notified if any differ"""
+    return status_store.update(**changes)
+
+def current_status():
+    """Return the current StatusSnapshot (never locks)"""
+    return status_store.snapshot()
+
+def current_uptime():
+    if not start_time:
+        return '00:00:00'
+    return str(datetime.now() - start_time).split('.')[0]
+
+
+app = Flask(__name__, template_folder=TEMPLATE_DIR)
 app.secret_key = os.urandom(24)  
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - started, (route, request.method))
+    return response
+
 def check_auth():
     """Check if user is authenticated"""
     return session.get('authenticated', False)
@@ -92,8 +827,8 @@ def login():
             session.permanent = True
             return redirect(url_for('index'))
         else:
-            return render_template('login.html', error='Invalid password!')
-    return render_template('login.html')
+            return serve_page('login.html', error='Invalid password!')
+    return serve_page('login.html')
 
 @app.route('/logout')
 def logout():
@@ -104,989 +839,2821 @@ def logout():
 def index():
     if not check_auth():
         return redirect(url_for('login'))
-    return render_template('index.html')
+    return serve_page('index.html')
 
 @app.route('/api/status')
 def get_status():
     if not check_auth():
         return jsonify({'error': 'Not authenticated'}), 401
-    global start_time
-    if start_time and app_status['monerod_running']:
-        uptime = str(datetime.now() - start_time).split('.')[0]
-        app_status['uptime'] = uptime
-    return jsonify(app_status)
+    snapshot = current_status()
+    # Weak ETag: uptime changes every second but is derived, not state
+    etag = f"{STATUS_EPOCH}-{snapshot.version}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(snapshot.to_dict())
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/start', methods=['POST'])
 def start_services():
     if not check_auth():
         return jsonify({'error': 'Not authenticated'}), 401
-    threading.Thread(target=start_all_services, daemon=True).start()
-    return jsonify({'message': 'Starting services...'})
+    state, started = lifecycle.start()
+    if state == 'stopping':
+        return jsonify({'error': 'Services are stopping', 'state': state}), 409
+    return jsonify({
+        'message': 'Starting services...' if started else f'Services already {state}',
+        'state': state,
+        'startup_phases': [phase._asdict() for phase in current_status().startup_phases]
+    })
+
+@app.route('/api/stop', methods=['POST'])
+def stop_services():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    operation = lifecycle.stop()
+    steps = operation.result() if operation else []
+    return jsonify({'message': 'Services stopped', 'steps': [step._asdict() for step in steps]})
+
+@app.route('/api/restart', methods=['POST'])
+def restart_services():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    state, operation = lifecycle.restart()
+    if operation is None:
+        return jsonify({'error': f'Services are {state}', 'state': state}), 409
+    steps = operation.result()
+    return jsonify({'message': 'Restarting services...', 'steps': [step._asdict() for step in steps]})
+
+@app.route('/api/profiles')
+def get_profiles():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    host = host_resources()
+    return jsonify({
+        'selected': selected_profile(),
+        'running': current_status().monerod_profile,
+        'host': host._asdict(),
+        'profiles': [
+            {'name': name, 'label': profile.label, 'description': profile.description,
+             'args': profile_args(name, host)}
+            for name, profile in MONEROD_PROFILES.items()
+        ]
+    })
+
+@app.route('/api/profile', methods=['POST'])
+def set_profile():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    name = (request.get_json(silent=True) or {}).get('profile')
+    if name not in MONEROD_PROFILES:
+        return jsonify({'error': f'Unknown profile: {name}'}), 400
+    save_settings(monerod_profile=name)
+    # Takes effect now if monerod runs with another profile, otherwise on next start
+    restarting = current_status().monerod_profile not in ('', name) and lifecycle.restart_monerod()
+    return jsonify({'profile': name, 'restarting': restarting})
+
+@app.route('/api/rpc/metrics')
+def get_rpc_metrics():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    return jsonify({
+        'batch_supported': rpc_client.batch_supported,
+        'methods': rpc_client.latency_stats(),
+        'poll_interval': rpc_scheduler.interval,
+        'polls_per_minute': round(rpc_scheduler.polls_per_minute, 2),
+        'consecutive_errors': rpc_scheduler.errors,
+        'onion_proxy': rpc_proxy.stats()
+    })
+
+@app.route('/api/tor/metrics')
+def get_tor_metrics():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    if tor_controller is None:
+        return jsonify({'error': 'TOR control port not connected'}), 503
+    return jsonify(dict(tor_controller.metrics(), cache=current_status().tor_cache,
+                        bootstrap_seconds=current_status().tor_bootstrap_seconds,
+                        bootstrap_history=load_bootstrap_history()))
+
+@app.route('/api/metrics/history')
+def get_metrics_history():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    names = request.args.get('series', ','.join(metrics_history.names)).split(',')
+    unknown = [name for name in names if name not in metrics_history.names]
+    if unknown:
+        return jsonify({'error': f'Unknown series: {", ".join(unknown)}'}), 400
+    try:
+        end = parse_time_arg(request.args.get('to')) or time.time()
+        start = parse_time_arg(request.args.get('from'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time: {str(e)}'}), 400
+    if start is None:
+        start = end - request.args.get('range', METRICS_DEFAULT_RANGE, type=float)
+    
+    step, series = metrics_history.query(names, start, end)
+    return jsonify({
+        'from': start,
+        'to': end,
+        'step': step,
+        'series': {name: [[t, round(v, 3)] for t, v in points] for name, points in series.items()}
+    })
+
+@app.route('/api/tor/pool', methods=['GET', 'POST'])
+def tor_pool_api():
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    if request.method == 'POST':
+        try:
+            size = int((request.get_json(silent=True) or {}).get('instances'))
+        except (TypeError, ValueError):
+            size = 0
+        if not 1 <= size <= TOR_POOL_MAX:
+            return jsonify({'error': f'instances must be between 1 and {TOR_POOL_MAX}'}), 400
+        save_settings(tor_instances=size)
+        if lifecycle.state == 'running' and tor_alive():
+            core.run(tor_pool.start(size))
+            # monerod only switches between direct SOCKS and the front on restart
+            if monerod_alive() and monerod_proxy_port != monerod_socks_port():
+                lifecycle.restart_monerod()
+    return jsonify({
+        'size': tor_pool_size(),
+        'max': TOR_POOL_MAX,
+        'front_port': TOR_POOL_FRONT_PORT if tor_pool.server is not None else None,
+        'members': tor_pool.metrics()
+    })
 
 @app.route('/api/logs/<service>')
 def get_logs(service):
     if not check_auth():
         return jsonify({'error': 'Not authenticated'}), 401
-    if service == 'tor':
-        return jsonify({'logs': app_status['tor_logs'][-100:]})  # Last 100 logs
-    elif service == 'monerod':
-        return jsonify({'logs': app_status['monerod_logs'][-100:]})
-    return jsonify({'logs': []})
+    buffer = log_buffers.get(service)
+    if buffer is None:
+        return jsonify({'logs': []})
+    if any(key in request.args for key in ('from', 'to', 'q', 'regex', 'after')):
+        return search_logs(service)
+    
+    since = request.args.get('since', type=int)
+    # Long-poll: hold the request until new lines arrive or wait expires
+    wait = min(max(request.args.get('wait', 0, type=float), 0), LOG_POLL_MAX_WAIT)
+    if wait and since is not None and 0 <= since == buffer.last_seq:
+        buffer.wait_for(since, wait)
+    return jsonify(log_delta(buffer, since))
+
+def parse_time_arg(value):
+    """Epoch seconds or an ISO 8601 timestamp (local time if no offset)"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def search_logs(service):
+    """Time-range and substring/regex search over the on-disk archive"""
+    try:
+        start = parse_time_arg(request.args.get('from'))
+        end = parse_time_arg(request.args.get('to'))
+        pattern = re.compile(request.args['regex']) if request.args.get('regex') else None
+    except (ValueError, re.error) as e:
+        return jsonify({'error': f'Invalid search: {str(e)}'}), 400
+    limit = min(max(request.args.get('limit', LOG_SEARCH_LIMIT, type=int), 1), LOG_SEARCH_LIMIT)
+    
+    archive = log_archives[service]
+    archive.flush()  # Include lines still waiting for the writer
+    results = archive.search(start, end, request.args.get('after', 0, type=int),
+                             request.args.get('q') or None, pattern, limit)
+    return jsonify({
+        'logs': [f"[{datetime.fromtimestamp(r.ts).strftime('%Y-%m-%d %H:%M:%S')}] {r.line}" for r in results],
+        # Archive sequence numbers, not the live tail's last_seq; pass as ?after= for the next page
+        'next_after': results[-1].seq if results else None,
+        'truncated': len(results) >= limit
+    })
+
+def log_delta(buffer, since):
+    """API payload with the entries after since, or the tail for a missing/stale cursor"""
+    if since is not None and (since < 0 or since > buffer.last_seq):
+        since = None  # Stale cursor (e.g. launcher restarted), resend the tail
+    # A delta carries everything after the cursor that the buffer still holds, never just the newest lines
+    entries = buffer.tail(LOG_TAIL_LINES) if since is None else buffer.since(since)
+    return {
+        'logs': [line for _, line in entries],
+        'last_seq': entries[-1][0] if entries else (since or 0),
+        # Client should replace its view instead of appending
+        'reset': since is None,
+        # Lines between the cursor and the first returned entry were dropped
+        'truncated': since is not None and bool(entries) and entries[0][0] > since + 1
+    }
+
+
+def parse_stream_cursor(event_id):
+    """Parse a Last-Event-ID of the form '<tor_seq>-<monerod_seq>'"""
+    try:
+        tor_seq, monerod_seq = (int(part) for part in event_id.split('-'))
+        return {'tor': tor_seq, 'monerod': monerod_seq}
+    except (AttributeError, ValueError):
+        return {'tor': None, 'monerod': None}
+
+def sse_event(event, data, event_id=None):
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+class StreamState:
+    """Per-connection cursors for /api/stream"""
+
+    def __init__(self, last_event_id):
+        self.cursors = parse_stream_cursor(last_event_id)
+        self.sent_status = {}
+        self.sent_version = -1
+
+    def pending(self):
+        """SSE messages for everything that changed since the previous call"""
+        messages = []
+        
+        # Status delta; uptime only rides along with real changes
+        snapshot = current_status()
+        if snapshot.version != self.sent_version:
+            status = snapshot.to_dict()
+            delta = {k: v for k, v in status.items() if self.sent_status.get(k) != v}
+            delta['uptime'] = status['uptime']
+            self.sent_status, self.sent_version = status, snapshot.version
+            messages.append(sse_event('status', delta))
+        
+        for service, buffer in log_buffers.items():
+            since = self.cursors[service]
+            reset = since is None or since > buffer.last_seq
+            entries = buffer.tail(LOG_TAIL_LINES) if reset else buffer.since(since)
+            if not entries and not reset:
+                continue
+            self.cursors[service] = entries[-1][0] if entries else 0
+            messages.append(sse_event('log', {
+                'service': service,
+                'logs': [line for _, line in entries],
+                'last_seq': self.cursors[service],
+                'reset': reset,
+                # The buffer overwrote lines this client had not been sent yet
+                'truncated': not reset and bool(entries) and entries[0][0] > since + 1
+            }, event_id=f"{self.cursors['tor'] or 0}-{self.cursors['monerod'] or 0}"))
+        return messages
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+@app.route('/api/stream')
+def stream_updates():
+    # Served natively by DashboardAsgi when uvicorn is available; this is the
+    # thread-per-connection fallback for the Werkzeug server
+    if not check_auth():
+        return jsonify({'error': 'Not authenticated'}), 401
+    state = StreamState(request.headers.get('Last-Event-ID'))
+    
+    def generate():
+        seen_version = -1
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        while True:
+            # Never yield under the lock: a client that stops reading would block notify_updates()
+            with updates:
+                updates.wait_for(lambda: update_version != seen_version, STREAM_HEARTBEAT)
+                idle = update_version == seen_version
+                seen_version = update_version
+            if idle:
+                yield ": keepalive\n\n"
+            else:
+                yield ''.join(state.pending())
+    
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# ========== Dashboard Pages ==========
+class StaticPage:
+    """A template rendered once and kept as identity, gzip and (optionally) brotli bodies.
+
+    Each encoding gets its own strong ETag, so a browser revalidating
+    over the hidden service gets a bodiless 304 while the page is
+    unchanged. The pages inline their CSS and JS and sit behind the login,
+    so they are revalidated on every load (no-cache) instead of cached
+    blind: a long max-age would keep showing the dashboard after logout.
+    """
+
+    def __init__(self, html):
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.bodies = {'identity': (body, digest)}
+        self.bodies['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f"{digest}-gz")
+        if brotli is not None:
+            self.bodies['br'] = (brotli.compress(body, quality=11), f"{digest}-br")
+
+    def response(self):
+        encoding = preferred_encoding(request.headers.get('Accept-Encoding', ''), self.bodies)
+        body, etag = self.bodies[encoding]
+        response = Response(body, mimetype='text/html')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+
+def preferred_encoding(header, available):
+    """Best of available for an Accept-Encoding header: br over gzip over identity"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ('br', 'gzip'):
+        if encoding in available and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+LOGIN_ERRORS = (None, 'Invalid password!')
+pages = {}
+
+def load_pages():
+    """Render every page variant from TEMPLATE_DIR once"""
+    with app.app_context():
+        loaded = {('index.html', None): StaticPage(render_template('index.html'))}
+        for error in LOGIN_ERRORS:
+            loaded[('login.html', error)] = StaticPage(render_template('login.html', error=error))
+    pages.update(loaded)
+
+def serve_page(name, error=None):
+    if not pages:
+        load_pages()
+    return pages[(name, error)].response()
+
+# ========== ASGI Dashboard Server ==========
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope and its buffered request body"""
+    server = scope.get('server') or ('127.0.0.1', WEB_PORT)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('127.0.0.1', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        if name in environ:
+            # Repeated headers become one field; cookies have their own separator
+            value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+        environ[name] = value
+    # The body is already buffered, so its length is known even for a chunked upload
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    return environ
+
+class DashboardAsgi:
+    """ASGI front for the dashboard, served by uvicorn on the core loop.
+
+    Endpoints that hold a connection open (the SSE stream and log
+    long-polls) are answered natively as coroutines, so an idle client
+    costs no thread. Everything else is passed through to the Flask app on
+    a thread pool, so a slow route (stop, restart) does not hold up the
+    others.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = concurrent.futures.ThreadPoolExecutor(DASHBOARD_THREADS, thread_name_prefix='dashboard')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            if path == '/api/stream':
+                return await self.stream(scope, receive, send)
+            if path.startswith('/api/logs/'):
+                query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+                if 'since' in query and 'wait' in query:
+                    started = time.perf_counter()
+                    try:
+                        return await self.log_poll(scope, receive, send, path[len('/api/logs/'):], query)
+                    finally:
+                        # Same labels as the Flask route, which after_request times when not under uvicorn
+                        HTTP_LATENCY.observe(time.perf_counter() - started, ('/api/logs/<service>', scope['method']))
+        await self.wsgi(scope, receive, send)
+
+    async def wsgi(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self.call_flask, scope, bytes(body))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    def call_flask(self, scope, body):
+        """Run one request through the Flask app on a pool thread and buffer its response"""
+        environ = wsgi_environ(scope, body)
+        started = []
+        
+        def start_response(status, response_headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]),
+                          [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response_headers]]
+        
+        output = self.flask_app(environ, start_response)
+        try:
+            content = b''.join(output)
+        finally:
+            if hasattr(output, 'close'):
+                output.close()
+        return started[0], started[1], content
+
+    def authenticated(self, scope):
+        """Check the Flask session cookie without a request context"""
+        cookies = SimpleCookie()
+        for name, value in scope.get('headers', []):
+            if name == b'cookie':
+                try:
+                    cookies.load(value.decode('latin-1'))
+                except CookieError:
+                    return False
+        morsel = cookies.get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        if morsel is None or serializer is None:
+            return False
+        try:
+            data = serializer.loads(morsel.value, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return False
+        return bool(data.get('authenticated', False))
+
+    @staticmethod
+    def header(scope, name):
+        for key, value in scope.get('headers', []):
+            if key == name:
+                return value.decode('latin-1')
+        return None
+
+    @staticmethod
+    async def send_json(send, status, payload):
+        body = json.dumps(payload).encode()
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode())
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def log_poll(self, scope, receive, send, service, query):
+        if not self.authenticated(scope):
+            return await self.send_json(send, 401, {'error': 'Not authenticated'})
+        buffer = log_buffers.get(service)
+        if buffer is None:
+            return await self.send_json(send, 200, {'logs': []})
+        try:
+            since = int(query['since'][0])
+            wait = min(max(float(query['wait'][0]), 0), LOG_POLL_MAX_WAIT)
+        except ValueError:
+            since, wait = None, 0
+        
+        deadline = time.monotonic() + wait
+        while since is not None and 0 <= since == buffer.last_seq:
+            changed = core.changed()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        await self.send_json(send, 200, log_delta(buffer, since))
+
+    async def stream(self, scope, receive, send):
+        started = time.perf_counter()
+        if not self.authenticated(scope):
+            await self.send_json(send, 401, {'error': 'Not authenticated'})
+            HTTP_LATENCY.observe(time.perf_counter() - started, ('/api/stream', scope['method']))
+            return
+        state = StreamState(self.header(scope, b'last-event-id'))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            *((name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items())
+        ]})
+        await send({'type': 'http.response.body', 'body': f"retry: {STREAM_RETRY_MS}\n\n".encode(), 'more_body': True})
+        # Like the Flask route, time until the stream opens rather than the whole connection
+        HTTP_LATENCY.observe(time.perf_counter() - started, ('/api/stream', scope['method']))
+        
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            while not disconnected.done():
+                changed = core.changed()
+                messages = state.pending()
+                if messages:
+                    await send({'type': 'http.response.body', 'body': ''.join(messages).encode(), 'more_body': True})
+                changed_wait = asyncio.ensure_future(changed.wait())
+                done, _ = await asyncio.wait({changed_wait, disconnected}, timeout=STREAM_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                changed_wait.cancel()
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b": keepalive\n\n", 'more_body': True})
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
 
 
 def log_message(service, message):
     timestamp = datetime.now().strftime('%H:%M:%S')
     log_entry = f"[{timestamp}] {message}"
     
-    if service == 'tor':
-        app_status['tor_logs'].append(log_entry)
-        if len(app_status['tor_logs']) > 10:  # Keep only last 500 logs
-            app_status['tor_logs'] = app_status['tor_logs'][-500:]
-    elif service == 'monerod':
-        app_status['monerod_logs'].append(log_entry)
-        if len(app_status['monerod_logs']) > 10:
-            app_status['monerod_logs'] = app_status['monerod_logs'][-500:]
+    buffer = log_buffers.get(service)
+    if buffer is not None:
+        buffer.append(log_entry)
+        log_archives[service].append([message])
+        LOG_LINES.inc((service,))
+        notify_updates()
+
+def log_messages(service, messages):
+    """log_message for a batch of lines, stamped and stored in one go"""
+    buffer = log_buffers.get(service)
+    if buffer is None or not messages:
+        return
+    now = datetime.now()
+    prefix = now.strftime('[%H:%M:%S] ')
+    buffer.extend([prefix + message for message in messages])
+    log_archives[service].append(messages, now.timestamp())
+    LOG_LINES.inc((service,), len(messages))
+    notify_updates()
+
+# ========== Core Event Loop ==========
+class CoreLoop:
+    """The launcher's event loop, running in one background thread.
+
+    Child processes and their output, the startup pipeline, RPC polling and
+    (when uvicorn is installed) the dashboard server all run on this loop.
+    Other threads hand work over with run(), submit() and call_soon().
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._changed = None
+        self._started = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='core-loop', daemon=True)
+                self._thread.start()
+        self._started.wait()
+
+    def in_loop(self):
+        return threading.current_thread() is self._thread
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop from another thread and return its result"""
+        if self.in_loop():
+            raise RuntimeError("CoreLoop.run() called from the loop itself; await the coroutine instead")
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Schedule a plain callback on the loop from any thread"""
+        if self.loop is None:
+            return
+        if self.in_loop():
+            self.loop.call_soon(callback, *args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def changed(self):
+        """asyncio.Event set by the next notify(); only call on the loop"""
+        return self._changed
+
+    def notify(self):
+        """Wake every coroutine waiting on changed()"""
+        self.call_soon(self._bump)
+
+    def _bump(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._changed = asyncio.Event()
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+
+core = CoreLoop()
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the loop's executor and await its result"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+# ========== Process I/O ==========
+class ManagedProcess:
+    """Popen-style handle (poll/terminate/kill/wait) for a child on the core loop"""
+
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    def poll(self):
+        return self.process.returncode
+
+    def terminate(self):
+        try:
+            self.process.terminate()
+        except ProcessLookupError:
+            pass
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass
+
+    def wait(self, timeout=None):
+        try:
+            return core.run(self.process.wait(), timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(self.pid, timeout)
+
+
+async def pump_output(stream, on_lines):
+    """Read a child's output in large chunks and hand complete lines to on_lines"""
+    pending = b''
+    while True:
+        chunk = await stream.read(PIPE_READ_SIZE)
+        if not chunk:
+            break
+        data = pending + chunk if pending else chunk
+        end = data.rfind(b'\n')
+        if end < 0 and len(data) < PIPE_READ_SIZE:
+            pending = data
+            continue
+        # A line longer than a whole chunk is flushed as-is
+        end = len(data) - 1 if end < 0 else end
+        pending = data[end + 1:]
+        dispatch_lines(on_lines, data[:end + 1])
+    if pending:
+        dispatch_lines(on_lines, pending)
+
+def dispatch_lines(on_lines, data):
+    lines = [line.strip() for line in data.decode('utf-8', errors='replace').splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return
+    try:
+        on_lines(lines)
+    except Exception as e:
+        print(f"Output handler error: {e}")
+
+async def start_process(args, on_lines):
+    """Start args with stdout+stderr piped to on_lines(list of str); runs on the core loop.
+
+    stdout is read in PIPE_READ_SIZE binary chunks and the complete lines of
+    each chunk are decoded in one call and handed over as a batch.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        limit=PIPE_READ_SIZE
+    )
+    asyncio.ensure_future(pump_output(process.stdout, on_lines))
+    return ManagedProcess(process)
+
+def spawn_process(args, on_lines):
+    """start_process for callers outside the core loop"""
+    return core.run(start_process(args, on_lines))
 
 def write_torrc():
-    if not os.path.exists(TOR_DATA_DIR):
-        os.makedirs(TOR_DATA_DIR)
+    # Tor refuses group/world-readable key and data directories on Unix
+    for directory in (TOR_DATA_DIR, HIDDEN_SERVICE_DIR, RPC_HIDDEN_SERVICE_DIR, P2P_HIDDEN_SERVICE_DIR):
+        os.makedirs(directory, mode=0o700, exist_ok=True)
     
     with open(TORRC_PATH, "w", encoding="utf-8") as f:
         f.write(f"""
+DataDirectory {TOR_DATA_DIR}
 SocksPort {SOCKS_PORT}
-HiddenServiceDir {TOR_DATA_DIR}
-HiddenServicePort {HIDDEN_SERVICE_PORT} 127.0.0.1:{LOCAL_PORT}
+ControlPort 127.0.0.1:{CONTROL_PORT}
+CookieAuthentication 1
+CookieAuthFile {TOR_COOKIE_PATH}
+HiddenServiceDir {HIDDEN_SERVICE_DIR}
 HiddenServicePort {HIDDEN_SERVICE_WEB_PORT} 127.0.0.1:{WEB_PORT}
+HiddenServiceDir {RPC_HIDDEN_SERVICE_DIR}
+HiddenServicePort {HIDDEN_SERVICE_PORT} 127.0.0.1:{RPC_PROXY_PORT}
+HiddenServiceExportCircuitID haproxy
+HiddenServiceDir {P2P_HIDDEN_SERVICE_DIR}
+HiddenServicePort {HIDDEN_SERVICE_P2P_PORT} 127.0.0.1:{MONEROD_ANONYMOUS_INBOUND_PORT}
 Log notice stdout
 AvoidDiskWrites 1
 """)
 
-def start_tor():
-    global tor_process
+async def start_tor():
+    global tor_process, tor_started
     log_message('tor', 'Starting TOR service...')
     write_torrc()
     
-    tor_process = subprocess.Popen(
-        [TOR_EXE, "-f", TORRC_PATH],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
+    cache, age = tor_cache_state()
+    tor_started = (cache, time.monotonic())
+    update_status(tor_cache=cache, tor_bootstrap_seconds=0.0)
+    if age is None:
+        log_message('tor', 'No cached directory information: cold start')
+    else:
+        log_message('tor', f'Cached consensus is {round(age / 60)} min old: {cache} start')
     
-    app_status['tor_running'] = True
-    threading.Thread(target=read_tor_logs, daemon=True).start()
+    PROCESS_STARTS.inc(('tor',))
+    tor_process = await start_process([TOR_EXE, "-f", TORRC_PATH], read_tor_logs)
+    update_status(tor_running=True)
+    supervisor.watch('tor', tor_process)
 
-def read_tor_logs():
-    while tor_process and tor_process.poll() is None:
-        try:
-            line = tor_process.stdout.readline()
-            if line:
-                log_message('tor', line.strip())
-                if "100%" in line and "bootstrapped" in line.lower():
-                    app_status['status'] = 'TOR network connected'
-        except:
-            break
+BOOTSTRAP_RE = re.compile(r'Bootstrapped (\d+)%')
+tor_bootstrapped = threading.Event()
 
-def wait_onion_address(timeout=60):
-    log_message('tor', 'Waiting for .onion address generation...')
-    start_time = time.time()
+tor_started = None  # (cache state, monotonic start time) of the current Tor run
+
+def tor_cache_state():
+    """('warm' | 'stale' | 'cold', consensus age in seconds or None) for TOR_DATA_DIR"""
+    try:
+        age = time.time() - os.path.getmtime(os.path.join(TOR_DATA_DIR, "cached-microdesc-consensus"))
+    except OSError:
+        return 'cold', None
+    return ('warm' if age < TOR_CONSENSUS_LIVE else 'stale'), max(0.0, age)
+
+def load_bootstrap_history():
+    try:
+        with open(TOR_BOOTSTRAP_HISTORY, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def record_bootstrap_time():
+    """Log and persist how long this Tor run took to bootstrap, next to the last run of the other kind"""
+    if tor_started is None:
+        return
+    cache, started = tor_started
+    seconds = round(time.monotonic() - started, 1)
+    update_status(tor_bootstrap_seconds=seconds)
+    
+    history = load_bootstrap_history()
+    entry = history.setdefault(cache, {})
+    entry['last'] = seconds
+    entry['best'] = min(entry.get('best', seconds), seconds)
+    entry['runs'] = entry.get('runs', 0) + 1
+    try:
+        with open(TOR_BOOTSTRAP_HISTORY, "w", encoding="utf-8") as f:
+            json.dump(history, f)
+    except OSError:
+        pass
     
-    while time.time() - start_time < timeout:
-        if os.path.exists(HOSTNAME_PATH):
+    other = 'cold' if cache != 'cold' else 'warm'
+    compare = f"; last {other} start took {history[other]['last']}s" if other in history else ''
+    log_message('tor', f'TOR bootstrapped in {seconds}s ({cache} start{compare})')
+
+def read_tor_logs(lines):
+    log_messages('tor', lines)
+    for line in lines:
+        if 'Bootstrapped' in line:
+            parse_tor_log(line)
+
+def parse_tor_log(log_line):
+    bootstrap = BOOTSTRAP_RE.search(log_line)
+    if bootstrap:
+        progress = int(bootstrap.group(1))
+        update_status(tor_bootstrap=progress)
+        if progress == 100:
+            tor_bootstrapped.set()
+            update_status(status='TOR network connected')
+
+# ========== Tor Control Port ==========
+class TorControlError(Exception):
+    """Tor's control port refused a command or the connection dropped"""
+
+
+class TorController:
+    """Cookie-authenticated Tor control connection with event tracking.
+
+    Subscribes to STATUS_CLIENT (bootstrap progress), CIRC (circuit
+    lifecycle), BW (bytes per second) and HS_DESC (onion descriptor uploads)
+    and keeps running metrics from them. A reader thread dispatches 650
+    events and hands command replies back to command().
+    """
+
+    EVENTS = ('STATUS_CLIENT', 'CIRC', 'BW', 'HS_DESC')
+    BUILD_TIME_SAMPLES = 50
+
+    def __init__(self, port=CONTROL_PORT, cookie_path=TOR_COOKIE_PATH, primary=True):
+        self.port = port
+        self.cookie_path = cookie_path
+        self.primary = primary  # Only the primary instance drives the launcher status
+        self.sock = None
+        self.bootstrap = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.read_bps = 0
+        self.written_bps = 0
+        self.circuits_built = 0
+        self.circuits_failed = 0
+        self.hs_published = threading.Event()
+        self._launched = {}
+        self._open = set()
+        self._build_times = []
+        self._replies = queue.Queue()
+        self._command_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+
+    def connect(self, timeout=5):
+        self.sock = socket.create_connection(('127.0.0.1', self.port), timeout=timeout)
+        self.sock.settimeout(None)
+        self._file = self.sock.makefile('r', encoding='ascii', errors='replace', newline='\r\n')
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        
+        with open(self.cookie_path, 'rb') as f:
+            cookie = f.read()
+        self.command(f"AUTHENTICATE {cookie.hex()}")
+        self.command(f"SETEVENTS {' '.join(self.EVENTS)}")
+        
+        # Catch up on state from before the subscription
+        phase = self.getinfo('status/bootstrap-phase')
+        self._on_bootstrap(phase)
+        for line in self.getinfo('circuit-status').splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == 'BUILT':
+                self._open.add(parts[0])
+        self._publish()
+
+    def command(self, line, timeout=10):
+        """Send a command and return its reply lines, raising TorControlError on failure"""
+        with self._command_lock:
+            self.sock.sendall(line.encode('ascii') + b"\r\n")
+            try:
+                reply = self._replies.get(timeout=timeout)
+            except queue.Empty:
+                raise TorControlError(f"No reply to {line.split()[0]}")
+        if reply is None:
+            raise TorControlError("Control connection closed")
+        if not reply[-1].startswith('250'):
+            raise TorControlError(reply[-1])
+        return reply
+
+    def getinfo(self, key):
+        """Return the value of one GETINFO key (multi-line values joined by newlines)"""
+        reply = self.command(f"GETINFO {key}")
+        values = []
+        for line in reply[:-1]:
+            values.append(line[4:].split('=', 1)[1] if line[4:].startswith(key + '=') else line)
+        return '\n'.join(value for value in values if value)
+
+    def metrics(self):
+        with self._metrics_lock:
+            build_times = sorted(self._build_times)
+            return {
+                'bootstrap': self.bootstrap,
+                'circuits_open': len(self._open),
+                'circuits_built': self.circuits_built,
+                'circuits_failed': self.circuits_failed,
+                'circuit_build_ms': {
+                    'samples': len(build_times),
+                    'avg': round(sum(build_times) / len(build_times), 1) if build_times else None,
+                    'median': build_times[len(build_times) // 2] if build_times else None,
+                    'max': build_times[-1] if build_times else None
+                },
+                'read_bps': self.read_bps,
+                'written_bps': self.written_bps,
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written,
+                'hidden_service_published': self.hs_published.is_set()
+            }
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def _read_loop(self):
+        reply = []
+        try:
+            for raw in self._file:
+                line = raw.rstrip('\r\n')
+                if line.startswith('650'):
+                    self._on_event(line[4:])
+                    continue
+                if line.startswith('250+'):
+                    # Data block: keep the key line, gather until the lone '.'
+                    data = [line]
+                    for raw_data in self._file:
+                        data_line = raw_data.rstrip('\r\n')
+                        if data_line == '.':
+                            break
+                        data.append(data_line)
+                    reply.append(data[0] + '\n'.join(data[1:]))
+                    continue
+                reply.append(line)
+                if len(line) >= 4 and line[3] == ' ':
+                    self._replies.put(reply)
+                    reply = []
+        except (OSError, ValueError):
+            pass
+        self._replies.put(None)
+
+    def _on_event(self, event):
+        kind, _, body = event.partition(' ')
+        if kind == 'BW':
+            read, written = (int(value) for value in body.split()[:2])
+            with self._metrics_lock:
+                self.read_bps, self.written_bps = read, written
+                self.bytes_read += read
+                self.bytes_written += written
+            if self.primary:
+                now = time.time()
+                metrics_history.record('tor_read_bps', read, now)
+                metrics_history.record('tor_written_bps', written, now)
+        elif kind == 'CIRC':
+            self._on_circuit(body.split())
+        elif kind == 'STATUS_CLIENT':
+            self._on_bootstrap(body)
+        elif kind == 'HS_DESC' and body.startswith('UPLOADED'):
+            self.hs_published.set()
+
+    def _on_circuit(self, fields):
+        if len(fields) < 2:
+            return
+        circuit_id, state = fields[0], fields[1]
+        now = time.monotonic()
+        with self._metrics_lock:
+            if state == 'LAUNCHED':
+                self._launched[circuit_id] = now
+            elif state == 'BUILT':
+                self._open.add(circuit_id)
+                self.circuits_built += 1
+                launched = self._launched.pop(circuit_id, None)
+                if launched is not None:
+                    self._build_times.append(round((now - launched) * 1000))
+                    del self._build_times[:-self.BUILD_TIME_SAMPLES]
+            elif state in ('FAILED', 'CLOSED'):
+                if state == 'FAILED':
+                    self.circuits_failed += 1
+                self._launched.pop(circuit_id, None)
+                self._open.discard(circuit_id)
+        self._publish()
+
+    def _on_bootstrap(self, body):
+        progress = re.search(r'BOOTSTRAP PROGRESS=(\d+)', body)
+        if progress:
+            self.bootstrap = int(progress.group(1))
+            if self.bootstrap == 100 and self.primary:
+                tor_bootstrapped.set()
+            self._publish()
+
+    def _publish(self):
+        if self.primary:
+            update_status(tor_bootstrap=self.bootstrap, tor_circuits=len(self._open))
+
+
+tor_controller = None
+
+def connect_tor_controller(timeout):
+    """Connect to Tor's control port once it is listening"""
+    global tor_controller
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and tor_alive():
+        controller = TorController()
+        try:
+            controller.connect()
+            tor_controller = controller
+            log_message('tor', f'Connected to TOR control port {CONTROL_PORT}')
+            return True
+        except (OSError, TorControlError):
+            controller.close()
+        time.sleep(0.25)
+    log_message('tor', 'WARNING: TOR control port unavailable, metrics disabled')
+    return False
+
+# ========== Tor Pool ==========
+class PoolMember:
+    """Routing counters shared by the primary Tor and the extra instances"""
+
+    def __init__(self, index, socks_port):
+        self.index = index
+        self.name = f'tor-{index}'
+        self.socks_port = socks_port
+        self.connections = 0  # Open front connections routed here
+        self.routed = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+
+    def metrics(self, controller, **extra):
+        tor = controller.metrics() if controller is not None else {}
+        return dict({
+            'name': self.name,
+            'socks_port': self.socks_port,
+            'healthy': self.healthy(),
+            'bootstrap': tor.get('bootstrap', 0),
+            'circuits_open': tor.get('circuits_open'),
+            'read_bps': tor.get('read_bps'),
+            'written_bps': tor.get('written_bps'),
+            'connections': self.connections,
+            'routed': self.routed,
+            'bytes_up': self.bytes_up,
+            'bytes_down': self.bytes_down
+        }, **extra)
+
+
+class PrimaryTor(PoolMember):
+    """The supervised Tor that also hosts the onion services"""
+
+    def __init__(self):
+        super().__init__(0, SOCKS_PORT)
+
+    def healthy(self):
+        return tor_alive() and tor_bootstrapped.is_set()
+
+    def metrics(self):
+        exits = [record for record in supervisor.exits if record.service == 'tor']
+        last_exit = f'{exits[-1].reason} after {round(exits[-1].ran_for)}s at {exits[-1].at}' if exits else ''
+        data = super().metrics(tor_controller, alive=tor_alive(), restarts=current_status().tor_restarts,
+                               last_exit=last_exit)
+        data['bootstrap'] = max(data['bootstrap'], current_status().tor_bootstrap)
+        return data
+
+
+class TorInstance(PoolMember):
+    """An extra SOCKS-only Tor with its own data directory, ports and crash restarts"""
+
+    def __init__(self, index):
+        super().__init__(index, TOR_POOL_SOCKS_BASE + index)
+        self.control_port = TOR_POOL_CONTROL_BASE + index
+        self.data_dir = os.path.join(BASE_DIR, f"tor_state_{index}")
+        self.torrc_path = os.path.join(BASE_DIR, f"torrc_{index}")
+        self.cookie_path = os.path.join(self.data_dir, "control_auth_cookie")
+        self.process = None
+        self.controller = None
+        self.bootstrap = 0
+        self.restarts = 0
+        self.last_exit = ''
+        self._crashes = CrashHistory()
+        self._stopping = False
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def healthy(self):
+        return self.alive() and self.bootstrap == 100
+
+    def metrics(self):
+        data = super().metrics(self.controller, alive=self.alive(), restarts=self.restarts, last_exit=self.last_exit,
+                               control_port=self.control_port)
+        data['bootstrap'] = max(data['bootstrap'], self.bootstrap)
+        return data
+
+    async def start(self):
+        self._stopping = False
+        self.bootstrap = 0
+        os.makedirs(self.data_dir, mode=0o700, exist_ok=True)
+        with open(self.torrc_path, "w", encoding="utf-8") as f:
+            f.write(f"""
+DataDirectory {self.data_dir}
+SocksPort {self.socks_port}
+ControlPort 127.0.0.1:{self.control_port}
+CookieAuthentication 1
+CookieAuthFile {self.cookie_path}
+Log notice stdout
+AvoidDiskWrites 1
+""")
+        log_message('tor', f'Starting pool instance {self.name} (SOCKS {self.socks_port})')
+        PROCESS_STARTS.inc((self.name,))
+        self.process = await start_process([TOR_EXE, "-f", self.torrc_path], self.read_logs)
+        asyncio.ensure_future(self._watch(self.process, time.monotonic()))
+        asyncio.ensure_future(self._connect_controller(self.process))
+
+    async def stop(self, steps):
+        self._stopping = True
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        controller, self.controller = self.controller, None
+        await halt_tor(steps, self.name, process, controller)
+
+    def read_logs(self, lines):
+        log_messages('tor', [f'[{self.name}] {line}' for line in lines])
+        for line in lines:
+            if 'Bootstrapped' in line:
+                bootstrap = BOOTSTRAP_RE.search(line)
+                if bootstrap:
+                    self.bootstrap = int(bootstrap.group(1))
+
+    async def _connect_controller(self, process):
+        alive = lambda: process.poll() is None
+        if not await wait_until(lambda: port_accepting(self.control_port), TOR_CONTROL_TIMEOUT, alive=alive):
+            return
+        controller = TorController(self.control_port, self.cookie_path, primary=False)
+        try:
+            await run_blocking(controller.connect)
+        except (OSError, TorControlError):
+            controller.close()
+            return
+        if process is self.process and alive():
+            self.controller = controller
+        else:
+            controller.close()
+
+    async def _watch(self, process, started):
+        code = await process.process.wait()
+        if process is not self.process:
+            return
+        ran_for = time.monotonic() - started
+        self.last_exit = f'{describe_exit(code)} after {round(ran_for)}s'
+        self.bootstrap = 0
+        if self.controller is not None:
+            self.controller.close()
+            self.controller = None
+        log_message('tor', f'{self.name} {self.last_exit}')
+        if self._stopping:
+            return
+        
+        delay = self._crashes.record(ran_for)
+        if delay is None:
+            log_message('tor', f'ERROR: {self.name} is crash-looping, automatic restart disabled')
+            return
+        await asyncio.sleep(delay)
+        if self._stopping or process is not self.process:
+            return
+        self.restarts += 1
+        PROCESS_RESTARTS.inc((self.name,))
+        await self.start()
+
+
+class TorPool:
+    """Spreads monerod's SOCKS connections over the primary Tor and extra instances.
+
+    A local SOCKS front on TOR_POOL_FRONT_PORT hands each new connection,
+    untouched, to the next bootstrapped instance in round-robin order, so
+    circuit building and cell crypto are shared across several Tor
+    processes. The SOCKS handshake itself is left to the chosen Tor. Extra
+    instances restart on their own after a crash; the front simply skips
+    them until they have bootstrapped again.
+    """
+
+    def __init__(self):
+        self.members = [PrimaryTor()]
+        self.server = None
+        self._next = 0
+
+    @property
+    def size(self):
+        return len(self.members)
+
+    async def start(self, size):
+        """Resize to size instances (primary included) and make sure the front is listening"""
+        for member in self.members[size:]:
+            await member.stop(ShutdownSteps())
+        del self.members[max(1, size):]
+        while len(self.members) < size:
+            self.members.append(TorInstance(len(self.members)))
+        for member in self.members[1:]:
+            if not member.alive():
+                await member.start()
+        if self.server is None:
+            self.server = await asyncio.start_server(self._handle, '127.0.0.1', TOR_POOL_FRONT_PORT)
+            log_message('tor', f'SOCKS front listening on 127.0.0.1:{TOR_POOL_FRONT_PORT}')
+
+    async def stop(self, steps):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for member in self.members[1:]:
+            await member.stop(steps)
+
+    def pick(self):
+        healthy = [member for member in self.members if member.healthy()] or self.members[:1]
+        self._next += 1
+        return healthy[self._next % len(healthy)]
+
+    def metrics(self):
+        return [member.metrics() for member in self.members]
+
+    async def _handle(self, reader, writer):
+        member = self.pick()
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection('127.0.0.1', member.socks_port)
+        except OSError:
+            writer.close()
+            return
+        member.connections += 1
+        member.routed += 1
+        try:
+            await asyncio.gather(self._pipe(reader, upstream_writer, member, 'bytes_up'),
+                                 self._pipe(upstream_reader, writer, member, 'bytes_down'))
+        finally:
+            member.connections -= 1
+            writer.close()
+            upstream_writer.close()
+
+    @staticmethod
+    async def _pipe(reader, writer, member, counter):
+        try:
+            while True:
+                data = await reader.read(PIPE_READ_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                setattr(member, counter, getattr(member, counter) + len(data))
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError, RuntimeError):
+            writer.close()
+
+
+tor_pool = TorPool()
+
+def tor_pool_size():
+    """tor_instances from launcher_settings.json, 1 (no pool) by default"""
+    try:
+        return min(max(int(load_settings().get('tor_instances', 1)), 1), TOR_POOL_MAX)
+    except (TypeError, ValueError):
+        return 1
+
+def monerod_socks_port():
+    return TOR_POOL_FRONT_PORT if tor_pool.server is not None else SOCKS_PORT
+
+# ========== File Watching ==========
+class InotifyWatcher:
+    """Wakes when a file is created or renamed into a directory (Linux)"""
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
             try:
-                with open(HOSTNAME_PATH, "r", encoding="utf-8") as f:
-                    onion = f.read().strip()
-                    if onion:
-                        return onion
-            except:
+                os.read(self.fd, 4096)  # Drain; the caller re-checks the file itself
+            except BlockingIOError:
                 pass
-        time.sleep(1)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Win32ChangeWatcher:
+    """Wakes when a file name or content changes in a directory (Windows)"""
+    FILE_NOTIFY_CHANGE_FILE_NAME = 0x001
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x010
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    def __init__(self, directory):
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self.handle = self.kernel32.FindFirstChangeNotificationW(
+            directory, False, self.FILE_NOTIFY_CHANGE_FILE_NAME | self.FILE_NOTIFY_CHANGE_LAST_WRITE)
+        if self.handle in (None, self.INVALID_HANDLE_VALUE):
+            raise OSError(ctypes.get_last_error(), "FindFirstChangeNotificationW failed")
+
+    def wait(self, timeout):
+        handle = ctypes.c_void_p(self.handle)
+        if self.kernel32.WaitForSingleObject(handle, int(timeout * 1000)) == 0:  # WAIT_OBJECT_0
+            self.kernel32.FindNextChangeNotification(handle)
+
+    def close(self):
+        self.kernel32.FindCloseChangeNotification(ctypes.c_void_p(self.handle))
+
+
+def open_dir_watcher(directory):
+    """Return a change watcher for directory, or None if the OS offers none"""
+    try:
+        if sys.platform.startswith('linux'):
+            return InotifyWatcher(directory)
+        if sys.platform == 'win32':
+            return Win32ChangeWatcher(directory)
+    except (OSError, AttributeError):
+        pass
     return None
 
-def start_monerod():
-    global monerod_process, start_time
+def read_nonempty(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def wait_for_file(path, timeout, alive=None):
+    """Return the stripped contents of path once it is non-empty, or None on timeout.
+
+    Sleeps on directory change notifications where available, otherwise
+    polls starting at 50 ms and backing off to 500 ms. Gives up early once
+    alive() returns false.
+    """
+    deadline = time.monotonic() + timeout
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    watcher = open_dir_watcher(directory)
+    interval = 0.05
+    try:
+        while True:
+            content = read_nonempty(path)
+            if content:
+                return content
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (alive is not None and not alive()):
+                return None
+            if watcher:
+                # Re-check at least every second in case an event slips past
+                watcher.wait(min(remaining, 1))
+            else:
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 2, 0.5)
+    finally:
+        if watcher:
+            watcher.close()
+
+def wait_onion_addresses(timeout=60):
+    """Return {'web', 'rpc', 'p2p'} onion hostnames, or None if one is missing at the deadline"""
+    log_message('tor', 'Waiting for .onion address generation...')
+    deadline = time.monotonic() + timeout
+    onions = {}
+    # Tor writes all hostname files during the same startup step
+    for name, path in (('web', HOSTNAME_PATH), ('rpc', RPC_HOSTNAME_PATH), ('p2p', P2P_HOSTNAME_PATH)):
+        onions[name] = wait_for_file(path, max(0.0, deadline - time.monotonic()), alive=tor_alive)
+        if not onions[name]:
+            return None
+    return onions
+
+current_onions = {}
+
+# ========== Monerod Profiles ==========
+HostResources = namedtuple('HostResources', 'cores ram_gb disk')
+MonerodProfile = namedtuple('MonerodProfile', 'label description flags')
+
+class MEMORYSTATUSEX(ctypes.Structure):
+    _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong)] + [
+        (name, ctypes.c_ulonglong) for name in (
+            'ullTotalPhys', 'ullAvailPhys', 'ullTotalPageFile', 'ullAvailPageFile',
+            'ullTotalVirtual', 'ullAvailVirtual', 'ullAvailExtendedVirtual')
+    ]
+
+def detect_ram_bytes():
+    if sys.platform == 'win32':
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(status)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+        return None
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def detect_disk_type(path):
+    """'ssd', 'hdd' or 'unknown' for the disk holding path"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)  # Not created yet on a first run; probe where it will be
+    if sys.platform.startswith('linux'):
+        dev = os.stat(path).st_dev
+        device = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+        # A partition has no queue/ of its own; its parent disk does
+        for candidate in (device, os.path.dirname(device)):
+            try:
+                with open(os.path.join(candidate, "queue", "rotational"), "r") as f:
+                    return 'hdd' if f.read().strip() == '1' else 'ssd'
+            except OSError:
+                continue
+        return 'unknown'
+    if sys.platform == 'win32':
+        drive = os.path.splitdrive(path)[0].rstrip(':')
+        if not drive:
+            return 'unknown'
+        script = (f"$n = (Get-Partition -DriveLetter {drive}).DiskNumber; "
+                  "(Get-PhysicalDisk | Where-Object DeviceId -eq $n).MediaType")
+        try:
+            result = subprocess.run(["powershell", "-NoProfile", "-Command", script],
+                                    capture_output=True, text=True, timeout=15)
+        except (OSError, subprocess.TimeoutExpired):
+            return 'unknown'
+        media = result.stdout.strip().upper()
+        return 'ssd' if media == 'SSD' else 'hdd' if media == 'HDD' else 'unknown'
+    return 'unknown'
+
+def monerod_data_dir():
+    """Where monerod keeps the blockchain: monerod_data_dir from launcher_settings.json, else monerod's default"""
+    configured = load_settings().get('monerod_data_dir')
+    if configured:
+        return configured
+    if sys.platform == 'win32':
+        return os.path.join(os.environ.get('PROGRAMDATA', r'C:\ProgramData'), 'bitmonero')
+    return os.path.expanduser(os.path.join('~', '.bitmonero'))
+
+_host_resources = {}
+
+def host_resources():
+    """Detected once per data directory: the disk probe can take seconds on Windows"""
+    data_dir = monerod_data_dir()
+    if data_dir not in _host_resources:
+        ram = detect_ram_bytes()
+        _host_resources[data_dir] = HostResources(os.cpu_count() or 1, round(ram / 2 ** 30, 1) if ram else None,
+                                                  detect_disk_type(data_dir))
+    return _host_resources[data_dir]
+
+def initial_sync_flags(host):
+    ram = host.ram_gb or 8
+    return {
+        # fastest risks a DB rebuild after a power cut, acceptable while nothing is synced yet
+        'db-sync-mode': 'fastest:async:1000000000bytes' if host.disk == 'ssd' else 'fast:async:250000000bytes',
+        'prep-blocks-threads': host.cores,
+        'max-concurrency': host.cores,
+        'block-sync-size': 100 if ram >= 16 else 50 if ram >= 8 else 20,
+        'out-peers': 32,
+        'in-peers': 32,
+        'limit-rate-up': 4096,
+        'limit-rate-down': 1048576
+    }
+
+def steady_state_flags(host):
+    return {
+        'db-sync-mode': 'safe',
+        'prep-blocks-threads': min(2, host.cores),
+        'max-concurrency': max(1, host.cores // 4),
+        'block-sync-size': 10,
+        'out-peers': 12,
+        'in-peers': 16,
+        'limit-rate-up': 1024,
+        'limit-rate-down': 4096
+    }
+
+def low_memory_flags(host):
+    return {
+        'db-sync-mode': 'safe:sync',
+        'prep-blocks-threads': 1,
+        'max-concurrency': min(2, host.cores),
+        'block-sync-size': 10,
+        'out-peers': 8,
+        'in-peers': 8,
+        'limit-rate-up': 512,
+        'limit-rate-down': 2048,
+        'prune-blockchain': None
+    }
+
+MONEROD_PROFILES = {
+    'default': MonerodProfile('monerod defaults', 'No tuning flags; monerod picks its own settings',
+                              lambda host: {}),
+    'initial_sync': MonerodProfile('Initial sync, max speed',
+                                   'All cores, large write batches and more peers while catching up',
+                                   initial_sync_flags),
+    'steady_state': MonerodProfile('Steady state, low footprint',
+                                   'Durable writes, few threads and modest bandwidth once synced',
+                                   steady_state_flags),
+    'low_memory': MonerodProfile('Low-memory box',
+                                 'Minimal threads, peers and batches; prunes the blockchain to about a third',
+                                 low_memory_flags)
+}
+
+def profile_args(name, host):
+    flags = MONEROD_PROFILES[name].flags(host)
+    return [f"--{flag}" if value is None else f"--{flag}={value}" for flag, value in flags.items()]
+
+def load_settings():
+    try:
+        with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        return settings if isinstance(settings, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_settings(**changes):
+    settings = dict(load_settings(), **changes)
+    with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+
+def selected_profile():
+    """The monerod_profile from launcher_settings.json, or 'default'"""
+    name = load_settings().get('monerod_profile', 'default')
+    return name if name in MONEROD_PROFILES else 'default'
+
+async def start_monerod():
+    global monerod_process, start_time, monerod_proxy_port
     log_message('monerod', 'Starting monerod daemon...')
     
+    socks_port = monerod_proxy_port = monerod_socks_port()
     args = [
         MONEROD_EXE,
-        f"--proxy=127.0.0.1:{SOCKS_PORT}",
+        f"--proxy=127.0.0.1:{socks_port}",
         "--hide-my-port",
         "--no-igd",
         "--confirm-external-bind",
-        f"--p2p-bind-port={LOCAL_PORT}",
+        "--p2p-bind-ip=127.0.0.1",
+        f"--p2p-bind-port={MONEROD_P2P_PORT}",
         f"--rpc-bind-port={LOCAL_PORT}",
         "--rpc-bind-ip=127.0.0.1",
+        "--rpc-restricted-bind-ip=127.0.0.1",
+        f"--rpc-restricted-bind-port={MONEROD_RESTRICTED_RPC_PORT}",
+        # Relay our own transactions to onion peers rather than clearnet ones
+        f"--tx-proxy=tor,127.0.0.1:{socks_port},{TX_PROXY_CONNECTIONS}",
         
         "--enable-dns-blocklist"
         
         
     ]
+    if load_settings().get('monerod_data_dir'):
+        args.append(f"--data-dir={monerod_data_dir()}")
+    if current_onions.get('p2p'):
+        # Inbound Tor peers reach monerod through the P2P onion
+        args.append(f"--anonymous-inbound={current_onions['p2p']}:{HIDDEN_SERVICE_P2P_PORT},"
+                    f"127.0.0.1:{MONEROD_ANONYMOUS_INBOUND_PORT},{ANONYMOUS_INBOUND_CONNECTIONS}")
+    profile = selected_profile()
+    host = await run_blocking(host_resources)
+    args += profile_args(profile, host)
+    command = subprocess.list2cmdline(args)
+    update_status(monerod_profile=profile, monerod_command=command)
+    log_message('monerod', f'Profile {MONEROD_PROFILES[profile].label}: {command}')
     
-    monerod_process = subprocess.Popen(
-        args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1
-    )
+    PROCESS_STARTS.inc(('monerod',))
+    monerod_process = await start_process(args, read_monerod_logs)
     
-    app_status['monerod_running'] = True
+    update_status(monerod_running=True)
     start_time = datetime.now()
-    threading.Thread(target=read_monerod_logs, daemon=True).start()
-    threading.Thread(target=monitor_monerod_status, daemon=True).start()
-
-def read_monerod_logs():
-    while monerod_process and monerod_process.poll() is None:
-        try:
-            line = monerod_process.stdout.readline()
-            if line:
-                log_message('monerod', line.strip())
-                parse_monerod_log(line.strip())
-        except:
-            break
-
-def parse_monerod_log(log_line):
-    # Parse block height
-    height_match = re.search(r'Height: (\d+)', log_line)
-    if height_match:
-        app_status['block_height'] = int(height_match.group(1))
+    supervisor.watch('monerod', monerod_process)
+    asyncio.ensure_future(monitor_monerod_status(monerod_process))
+
+monerod_proxy_port = None
+
+def read_monerod_logs(lines):
+    log_messages('monerod', lines)
+    events = []
+    started = time.perf_counter()
+    for line in lines:
+        events.extend(parse_monerod_line(line))
+    if lines:
+        LOG_PARSE_SECONDS.observe((time.perf_counter() - started) / len(lines), count=len(lines))
+    apply_monerod_events(events)
+
+# ========== Monerod Log Parser ==========
+def apply_monerod_events(events):
+    """Fold parsed monerod log events into the status"""
+    changes = {}
+    peer_delta = 0
+    for kind, value in events:
+        if kind == HEIGHT:
+            changes['block_height'] = value
+        elif kind == TARGET_HEIGHT:
+            changes['target_height'] = value
+        elif kind == SYNC_STATE:
+            changes['sync_status'] = value
+            changes['status'] = 'Fully synchronized' if value == 'Synced' else 'Synchronizing blockchain...'
+        elif kind == MINING_STATE:
+            changes['mining_status'] = value
+        elif kind == HASH_RATE:
+            changes['hash_rate'] = value
+        elif kind == PEER_COUNT:
+            changes['connections'] = value
+            peer_delta = 0
+        elif kind == PEER_CONNECTED:
+            peer_delta += 1
+        elif kind == PEER_DISCONNECTED:
+            peer_delta -= 1
+    if not changes and not peer_delta:
+        return
     
-    # Parse sync status
-    if "Synced" in log_line:
-        app_status['sync_status'] = 'Synced'
-        app_status['status'] = 'Fully synchronized'
-    elif "synchronizing" in log_line.lower():
-        app_status['sync_status'] = 'Synchronizing'
-        app_status['status'] = 'Synchronizing blockchain...'
+    def compute(snapshot):
+        result = dict(changes)
+        if 'target_height' in changes:
+            # As in poll_monerod_rpc, the target is never below our own height
+            result['target_height'] = max(changes['target_height'], changes.get('block_height', snapshot.block_height))
+        if peer_delta:
+            result['connections'] = max(0, changes.get('connections', snapshot.connections) + peer_delta)
+        return result
     
-    # Parse mining status
-    if "mining" in log_line.lower() and "started" in log_line.lower():
-        app_status['mining_status'] = 'Mining active'
-    elif "mining" in log_line.lower() and ("stopped" in log_line.lower() or "paused" in log_line.lower()):
-        app_status['mining_status'] = 'Mining stopped'
-    
-    # Parse hash rate
-    hash_match = re.search(r'(\d+\.?\d*)\s*H/s', log_line)
-    if hash_match:
-        app_status['hash_rate'] = f"{hash_match.group(1)} H/s"
+    status_store.modify(compute)
+    if 'block_height' in changes or 'sync_status' in changes or peer_delta or 'connections' in changes:
+        rpc_scheduler.wake()
+
+# ========== Monerod RPC Client ==========
+class RpcError(Exception):
+    """monerod answered with a JSON-RPC error or an unusable response"""
+
+
+class MonerodRpcClient:
+    """JSON-RPC client for monerod with a pooled keep-alive session.
+
+    batch() sends several methods in one round trip. monerod builds that
+    do not accept JSON-RPC batch arrays are detected on first use, after
+    which batches are sent as sequential calls over the same connection.
+    Latency is recorded per method and exposed by latency_stats().
+    """
+
+    def __init__(self, base_url, timeout=RPC_TIMEOUT, pool_size=4):
+        self.base_url = base_url
+        self.url = f"{base_url}/json_rpc"
+        self.timeout = timeout
+        self.batch_supported = True
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def call(self, method, params=None):
+        """Call one method and return its result, raising RpcError on failure"""
+        payload = {"jsonrpc": "2.0", "id": "0", "method": method}
+        if params is not None:
+            payload["params"] = params
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            result = self._result(response.json() if response.status_code == 200 else None, method)
+            ok = True
+            return result
+        except ValueError as e:
+            raise RpcError(f"{method}: invalid JSON response") from e
+        finally:
+            self._record(method, time.perf_counter() - started, ok)
+
+    def batch(self, calls):
+        """Call several (method, params) pairs; returns results or RpcError per call"""
+        if self.batch_supported:
+            payload = [
+                {"jsonrpc": "2.0", "id": str(index), "method": method, **({"params": params} if params is not None else {})}
+                for index, (method, params) in enumerate(calls)
+            ]
+            started = time.perf_counter()
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            elapsed = time.perf_counter() - started
+            try:
+                replies = response.json() if response.status_code == 200 else None
+            except ValueError:
+                replies = None
+            if isinstance(replies, list):
+                by_id = {reply.get('id'): reply for reply in replies if isinstance(reply, dict)}
+                results = []
+                for index, (method, _) in enumerate(calls):
+                    try:
+                        results.append(self._result(by_id.get(str(index)), method))
+                        self._record(method, elapsed, True)
+                    except RpcError as e:
+                        results.append(e)
+                        self._record(method, elapsed, False)
+                return results
+            # This monerod does not understand batch arrays
+            self.batch_supported = False
+        
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self.call(method, params))
+            except RpcError as e:
+                results.append(e)
+        return results
+
+    def stop_daemon(self):
+        """Ask monerod to shut down cleanly (a plain RPC endpoint, not JSON-RPC)"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(f"{self.base_url}/stop_daemon", json={}, timeout=self.timeout)
+            response.raise_for_status()
+            status = response.json().get('status')
+            if status != 'OK':
+                raise RpcError(f"stop_daemon: {status}")
+            ok = True
+        except ValueError as e:
+            raise RpcError("stop_daemon: invalid JSON response") from e
+        finally:
+            self._record('stop_daemon', time.perf_counter() - started, ok)
+
+    def latency_stats(self):
+        """Per-method call counts, errors and latency in milliseconds"""
+        with self._metrics_lock:
+            return {
+                method: {
+                    'calls': m['calls'],
+                    'errors': m['errors'],
+                    'avg_ms': round(m['total'] / m['calls'] * 1000, 2),
+                    'max_ms': round(m['max'] * 1000, 2),
+                    'last_ms': round(m['last'] * 1000, 2)
+                }
+                for method, m in self._metrics.items()
+            }
 
-def monitor_monerod_status():
-    while app_status['monerod_running']:
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def _result(reply, method):
+        if not isinstance(reply, dict):
+            raise RpcError(f"{method}: no reply")
+        if 'error' in reply:
+            raise RpcError(f"{method}: {reply['error'].get('message', reply['error'])}")
+        if 'result' not in reply:
+            raise RpcError(f"{method}: reply without result")
+        return reply['result']
+
+    def _record(self, method, elapsed, ok):
+        RPC_LATENCY.observe(elapsed, (method,))
+        if not ok:
+            RPC_ERRORS.inc((method,))
+        with self._metrics_lock:
+            m = self._metrics.setdefault(method, {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            m['calls'] += 1
+            m['errors'] += 0 if ok else 1
+            m['total'] += elapsed
+            m['max'] = max(m['max'], elapsed)
+            m['last'] = elapsed
+
+
+class PollScheduler:
+    """Adaptive interval for the monerod RPC monitor.
+
+    Polls every min_interval while the node is syncing or its height moves,
+    and multiplies the interval by backoff (up to max_interval) while it is
+    idle and synced or while RPC calls keep failing. wake() cuts the current
+    wait short, but never below min_interval since the previous poll.
+    """
+
+    def __init__(self, min_interval=RPC_POLL_MIN_INTERVAL, max_interval=RPC_POLL_MAX_INTERVAL,
+                 backoff=RPC_POLL_BACKOFF):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.errors = 0
+        self._last_poll = 0.0
+        self._wake = None  # asyncio.Event, created on the core loop
+
+    @property
+    def polls_per_minute(self):
+        return 60 / self.interval
+
+    def reset(self):
+        self.interval = self.min_interval
+        self.errors = 0
+
+    def record_success(self, active):
+        self.errors = 0
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def record_error(self):
+        self.errors += 1
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def wake(self):
+        """Ask for a poll as soon as the rate limit allows; safe from any thread"""
+        core.call_soon(self._set_wake)
+
+    def _set_wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def wait(self):
+        """Sleep until the next poll is due or wake() is called"""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        remaining = self._last_poll + self.interval - time.monotonic()
+        if remaining > 0:
+            try:
+                await asyncio.wait_for(self._wake.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        self._wake.clear()
+        earliest = self._last_poll + self.min_interval - time.monotonic()
+        if earliest > 0:
+            await asyncio.sleep(earliest)
+        self._last_poll = time.monotonic()
+
+
+rpc_client = MonerodRpcClient(f'http://127.0.0.1:{LOCAL_PORT}')
+rpc_scheduler = PollScheduler()
+
+# Fetched together on every status poll
+STATUS_RPC_CALLS = [
+    ('get_info', None),
+    ('sync_info', None),
+    ('get_connections', None),
+    ('hard_fork_info', None)
+]
+
+def poll_monerod_rpc():
+    """Fetch node state in one batched round trip and fold it into the status.
+
+    Returns (height_changed, syncing) for the poll scheduler.
+    """
+    info, sync, connections, hard_fork = rpc_client.batch(STATUS_RPC_CALLS)
+    previous = current_status()
+    if isinstance(info, RpcError):
+        raise info
+    
+    changes = {
+        'block_height': info.get('height', previous.block_height),
+        'connections': info.get('outgoing_connections_count', 0) + info.get('incoming_connections_count', 0),
+        'sync_status': 'Synced' if info.get('synchronized', False) else 'Synchronizing'
+    }
+    target = info.get('target_height', 0)
+    if not isinstance(sync, RpcError):
+        target = max(target, sync.get('target_height', 0))
+    changes['target_height'] = max(target, changes['block_height'])
+    if not isinstance(connections, RpcError):
+        changes['connections'] = len(connections.get('connections') or [])
+    if not isinstance(hard_fork, RpcError):
+        changes['hard_fork_version'] = hard_fork.get('version', 0)
+    height_changed = changes['block_height'] != previous.block_height
+    update_status(**changes)
+    return height_changed, changes['sync_status'] != 'Synced'
+
+async def monitor_monerod_status(process):
+    rpc_scheduler.reset()
+    # Ends with this monerod run, so a restart never leaves two pollers behind
+    while monerod_process is process and process.poll() is None:
         try:
-            # Try to get info from monerod RPC
-            response = requests.post(
-                f'http://127.0.0.1:{LOCAL_PORT}/json_rpc',
-                json={
-                    "jsonrpc": "2.0",
-                    "id": "0",
-                    "method": "get_info"
-                },
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'result' in data:
-                    result = data['result']
-                    app_status['block_height'] = result.get('height', app_status['block_height'])
-                    app_status['connections'] = result.get('outgoing_connections_count', 0) + result.get('incoming_connections_count', 0)
-                    
-                    if result.get('synchronized', False):
-                        app_status['sync_status'] = 'Synced'
-                    else:
-                        app_status['sync_status'] = 'Synchronizing'
-                        
-        except:
-            pass  # Ignore RPC errors
+            # The HTTP round trip blocks, so it runs in the loop's executor
+            height_changed, syncing = await run_blocking(poll_monerod_rpc)
+            rpc_scheduler.record_success(active=height_changed or syncing)
+        except (requests.RequestException, RpcError) as e:
+            RPC_POLL_ERRORS.inc(('rpc' if isinstance(e, RpcError) else 'http',))
+            rpc_scheduler.record_error()  # monerod may still be starting up
         
-        time.sleep(30)  # Check every 30 seconds
+        update_status(rpc_poll_interval=round(rpc_scheduler.interval, 1))
+        await rpc_scheduler.wait()
+
+# ========== Onion RPC Proxy ==========
+ProxyReply = namedtuple('ProxyReply', 'status content_type body')
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+                408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large', 429: 'Too Many Requests',
+                431: 'Request Header Fields Too Large', 502: 'Bad Gateway'}
+
+# What monerod serves with --restricted-rpc that a wallet needs; everything else is refused here
+RPC_PROXY_JSON_METHODS = frozenset([
+    'get_block_count', 'getblockcount', 'on_get_block_hash', 'on_getblockhash', 'get_last_block_header',
+    'getlastblockheader', 'get_block_header_by_hash', 'getblockheaderbyhash', 'get_block_header_by_height',
+    'getblockheaderbyheight', 'get_block_headers_range', 'getblockheadersrange', 'get_block', 'getblock',
+    'get_info', 'hard_fork_info', 'get_fee_estimate', 'get_version', 'get_output_histogram',
+    'get_output_distribution', 'get_txpool_backlog', 'get_miner_data'
+])
+RPC_PROXY_PATHS = frozenset([
+    '/json_rpc', '/get_height', '/getheight', '/get_info', '/getinfo', '/get_transactions', '/gettransactions',
+    '/get_outs', '/is_key_image_spent', '/send_raw_transaction', '/sendrawtransaction', '/get_transaction_pool',
+    '/get_transaction_pool_hashes', '/get_transaction_pool_stats', '/get_fee_estimate', '/get_limit',
+    '/getblocks.bin', '/get_blocks.bin', '/getblocks_by_height.bin', '/get_blocks_by_height.bin',
+    '/gethashes.bin', '/get_hashes.bin', '/get_o_indexes.bin', '/get_outs.bin',
+    '/get_transaction_pool_hashes.bin', '/get_output_distribution.bin'
+])
+# Small tip-state replies every wallet asks for and that only change when a block is added; cached
+# per chain height. Bulk sync calls (blocks, ranges, .bin) differ per wallet and are only coalesced.
+RPC_PROXY_CACHED_METHODS = frozenset([
+    'get_block_count', 'getblockcount', 'on_get_block_hash', 'on_getblockhash', 'get_last_block_header',
+    'getlastblockheader', 'get_block_header_by_hash', 'getblockheaderbyhash', 'get_block_header_by_height',
+    'getblockheaderbyheight', 'get_info', 'hard_fork_info', 'get_fee_estimate', 'get_version'
+])
+RPC_PROXY_CACHED_PATHS = frozenset(['/get_height', '/getheight', '/get_info', '/getinfo', '/get_fee_estimate'])
+
+def proxy_error(status, message):
+    return ProxyReply(status, 'application/json', json.dumps({'error': message}).encode('utf-8'))
+
+
+class RpcProxy:
+    """Caching HTTP front between the RPC onion and monerod's restricted RPC.
+
+    Replies to chain-state requests are cached per block height and dropped
+    as soon as the status shows a new block, with RPC_PROXY_CACHE_TTL as a
+    backstop. Identical requests already on their way to monerod share one
+    upstream call, only restricted-RPC endpoints and methods are let
+    through, and each client may have RPC_PROXY_CLIENT_CONCURRENCY requests
+    in flight. Tor tags every onion connection with a PROXY protocol header
+    (HiddenServiceExportCircuitID), so a client here is one Tor circuit.
+    """
+
+    def __init__(self, upstream, port):
+        self.upstream = upstream
+        self.port = port
+        self.server = None
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=RPC_PROXY_UPSTREAM_CONCURRENCY))
+        self.cache = {}  # key -> (height, stored_at, ProxyReply); dicts keep insertion order for eviction
+        self.cache_bytes = 0
+        self.inflight = {}
+        self.clients = {}  # client -> requests in flight
+        self.connections = {}  # client -> open connections
+        self.height = None
+        self._upstream_slots = None
+
+    async def start(self):
+        if self.server is None:
+            self._upstream_slots = asyncio.Semaphore(RPC_PROXY_UPSTREAM_CONCURRENCY)
+            self.server = await asyncio.start_server(self._serve, '127.0.0.1', self.port,
+                                                     limit=RPC_PROXY_MAX_HEADER_BYTES)
+            log_message('monerod', f'Onion RPC proxy listening on 127.0.0.1:{self.port}')
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def on_status(self, snapshot, changed):
+        """Status subscriber: a new block makes every cached reply stale"""
+        if 'block_height' in changed:
+            core.call_soon(self._new_height, snapshot.block_height)
+
+    def _new_height(self, height):
+        if height != self.height:
+            self.height = height
+            self.cache.clear()
+            self.cache_bytes = 0
+
+    def stats(self):
+        outcomes = {labels[0][1]: value for _, labels, value in RPC_PROXY_REQUESTS.samples()}
+        served = sum(outcomes.get(name, 0) for name in ('hit', 'coalesced', 'miss', 'uncached'))
+        saved = outcomes.get('hit', 0) + outcomes.get('coalesced', 0)
+        return {
+            'listening': self.server is not None,
+            'requests': outcomes,
+            'upstream_saved_ratio': round(saved / served, 3) if served else None,
+            'cache_entries': len(self.cache),
+            'cache_bytes': self.cache_bytes,
+            'cache_height': self.height,
+            'inflight': len(self.inflight),
+            'clients': len(self.clients),
+            'connections': sum(self.connections.values())
+        }
 
-def start_all_services():
-    try:
-        app_status['status'] = 'Starting TOR...'
-        start_tor()
+    async def _serve(self, reader, writer):
+        client = writer.get_extra_info('peername')
+        client = client[0] if client else 'local'
+        counted = False
+        try:
+            line = await asyncio.wait_for(reader.readline(), RPC_PROXY_IDLE_TIMEOUT)
+            if line.startswith(b'PROXY '):
+                # "PROXY TCP6 fc00:dead:beef:4dad::<circuit id> ::1 <port> <port>" from Tor
+                parts = line.split()
+                if len(parts) > 2:
+                    client = parts[2].decode('ascii', 'replace')
+                line = b''
+            # Counted before any parsing, so one circuit cannot hold open sockets without limit
+            if self.connections.get(client, 0) >= RPC_PROXY_CLIENT_CONNECTIONS:
+                RPC_PROXY_REQUESTS.inc(('limited',))
+                await self._respond(writer, proxy_error(429, 'Too many connections'), False)
+                return
+            self.connections[client] = self.connections.get(client, 0) + 1
+            counted = True
+            if not line:
+                line = await asyncio.wait_for(reader.readline(), RPC_PROXY_IDLE_TIMEOUT)
+            while line:
+                keep_alive = await self._exchange(line, reader, writer, client)
+                if not keep_alive:
+                    break
+                line = await asyncio.wait_for(reader.readline(), RPC_PROXY_IDLE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, ConnectionError, OSError):
+            pass
+        finally:
+            if counted:
+                if self.connections[client] <= 1:
+                    del self.connections[client]
+                else:
+                    self.connections[client] -= 1
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader):
+        """Header fields up to the blank line; None if there are too many or they are too large"""
+        headers = {}
+        count = size = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            count += 1
+            size += len(line)
+            if count > RPC_PROXY_MAX_HEADERS or size > RPC_PROXY_MAX_HEADER_BYTES:
+                return None
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def _exchange(self, request_line, reader, writer, client):
+        """Read one request, answer it and return whether the connection stays open"""
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            await self._respond(writer, proxy_error(400, 'Malformed request line'), False)
+            return False
+        try:
+            headers = await asyncio.wait_for(self._read_headers(reader), RPC_PROXY_HEADER_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self._respond(writer, proxy_error(408, 'Request headers not received in time'), False)
+            return False
+        except (ValueError, asyncio.LimitOverrunError):
+            headers = None  # A single line longer than the stream limit
+        if headers is None:
+            await self._respond(writer, proxy_error(431, 'Request headers too large'), False)
+            return False
+        keep_alive = (headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                      else headers.get('connection', '').lower() == 'keep-alive')
         
-        app_status['status'] = 'Waiting for .onion address...'
-        onion = wait_onion_address()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            await self._respond(writer, proxy_error(411, 'Content-Length required'), False)
+            return False
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= RPC_PROXY_MAX_BODY:
+            await self._respond(writer, proxy_error(413, 'Request body too large'), False)
+            return False
+        body = await asyncio.wait_for(reader.readexactly(length), RPC_PROXY_IDLE_TIMEOUT) if length else b''
         
-        if not onion:
-            app_status['status'] = 'Failed to get .onion address'
-            log_message('tor', 'ERROR: Failed to generate .onion address')
-            return
+        reply = await self.handle(client, method, target.split('?', 1)[0], body)
+        await self._respond(writer, reply, keep_alive)
+        return keep_alive
+
+    @staticmethod
+    async def _respond(writer, reply, keep_alive):
+        head = (f"HTTP/1.1 {reply.status} {HTTP_REASONS.get(reply.status, '')}\r\n"
+                f"Content-Type: {reply.content_type}\r\n"
+                f"Content-Length: {len(reply.body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + reply.body)
+        await writer.drain()
+
+    async def handle(self, client, method, path, body):
+        """Filter, rate-limit and answer one request from client"""
+        if method not in ('GET', 'POST'):
+            RPC_PROXY_REQUESTS.inc(('denied',))
+            return proxy_error(405, 'Only GET and POST are supported')
+        if path not in RPC_PROXY_PATHS:
+            RPC_PROXY_REQUESTS.inc(('denied',))
+            return proxy_error(403 if path.startswith('/') else 400, 'Not available on this node')
         
-        app_status['onion_address'] = f"{onion}:{HIDDEN_SERVICE_PORT}"
-        log_message('tor', f'Onion address generated: {onion}')
+        request_id = None
+        if path == '/json_rpc':
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                RPC_PROXY_REQUESTS.inc(('denied',))
+                return proxy_error(400, 'Invalid JSON')
+            if not isinstance(payload, dict):
+                RPC_PROXY_REQUESTS.inc(('denied',))
+                return proxy_error(400, 'Batch requests are not supported')
+            rpc_method = payload.get('method')
+            if rpc_method not in RPC_PROXY_JSON_METHODS:
+                RPC_PROXY_REQUESTS.inc(('denied',))
+                return proxy_error(403, f'Method not available on this node: {rpc_method}')
+            request_id = payload.get('id')
+            # The id differs per wallet and is put back into the shared reply below
+            params = json.dumps(payload.get('params'), sort_keys=True, separators=(',', ':'))
+            key = (path, rpc_method, params)
+            cacheable = rpc_method in RPC_PROXY_CACHED_METHODS
+            body = json.dumps({'jsonrpc': '2.0', 'id': '0', 'method': rpc_method,
+                               **({'params': payload['params']} if 'params' in payload else {})}).encode('utf-8')
+        else:
+            key = (path, method, hashlib.sha256(body).digest())
+            cacheable = path in RPC_PROXY_CACHED_PATHS
         
-        app_status['status'] = 'Waiting for TOR network stability...'
-        time.sleep(15)  # Wait for TOR network stability
+        active = self.clients.get(client, 0)
+        if active >= RPC_PROXY_CLIENT_CONCURRENCY:
+            RPC_PROXY_REQUESTS.inc(('limited',))
+            return proxy_error(429, 'Too many concurrent requests')
+        self.clients[client] = active + 1
+        try:
+            reply = await self._fetch(key, method, path, body, cacheable)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_message('monerod', f'Onion RPC proxy: {path} failed: {e!r}')
+            reply = proxy_error(502, 'Upstream request failed')
+        finally:
+            if self.clients[client] <= 1:
+                del self.clients[client]
+            else:
+                self.clients[client] -= 1
         
-        app_status['status'] = 'Starting monerod...'
-        start_monerod()
+        if request_id is not None and reply.status == 200:
+            try:
+                answer = json.loads(reply.body)
+                answer['id'] = request_id
+                reply = reply._replace(body=json.dumps(answer).encode('utf-8'))
+            except (ValueError, TypeError):
+                pass
+        return reply
+
+    async def _fetch(self, key, method, path, body, cacheable):
+        if self.height is None:
+            self.height = current_status().block_height
+        if cacheable:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] == self.height and time.monotonic() - entry[1] < RPC_PROXY_CACHE_TTL:
+                RPC_PROXY_REQUESTS.inc(('hit',))
+                return entry[2]
         
-        app_status['status'] = 'Services running anonymously via TOR'
-        log_message('monerod', 'monerod is now running anonymously through TOR network')
+        pending = self.inflight.get(key)
+        if pending is not None:
+            RPC_PROXY_REQUESTS.inc(('coalesced',))
+            return await asyncio.shield(pending)
         
-    except Exception as e:
-        app_status['status'] = f'Error: {str(e)}'
-        log_message('monerod', f'ERROR: {str(e)}')
-
-def start_web_server():
-    global web_server, server_thread
-    
-    # Create templates directory and HTML files
-    os.makedirs('templates', exist_ok=True)
-    
-    # Login page HTML
-    login_html = '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🧅 Secure Access - Monerod TOR Launcher</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
-            color: #ffffff;
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-
-        .login-container {
-            background: rgba(255, 255, 255, 0.05);
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 25px;
-            padding: 50px;
-            width: 100%;
-            max-width: 450px;
-            text-align: center;
-            box-shadow: 0 25px 50px rgba(0, 0, 0, 0.3);
-            animation: fadeInUp 1s ease-out;
-        }
-
-        .login-header {
-            margin-bottom: 40px;
-        }
-
-        .login-header h1 {
-            font-size: 2.5rem;
-            background: linear-gradient(45deg, #00ff88, #00ccff);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            margin-bottom: 15px;
-            text-shadow: 0 0 30px rgba(0, 255, 136, 0.3);
-        }
-
-        .login-header .subtitle {
-            color: #8892b0;
-            font-size: 1.1rem;
-            margin-bottom: 10px;
-        }
-
-        .security-notice {
-            background: rgba(255, 193, 7, 0.1);
-            border: 1px solid rgba(255, 193, 7, 0.3);
-            border-radius: 10px;
-            padding: 15px;
-            margin: 20px 0;
-            color: #ffc107;
-            font-size: 0.9rem;
-        }
-
-        .form-group {
-            margin-bottom: 30px;
-            text-align: left;
-        }
-
-        .form-group label {
-            display: block;
-            color: #8892b0;
-            margin-bottom: 8px;
-            font-weight: 500;
-        }
-
-        .form-control {
-            width: 100%;
-            padding: 15px 20px;
-            background: rgba(255, 255, 255, 0.08);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-            border-radius: 12px;
-            color: #ffffff;
-            font-size: 1.1rem;
-            transition: all 0.3s ease;
-        }
-
-        .form-control:focus {
-            outline: none;
-            border-color: #00ff88;
-            box-shadow: 0 0 20px rgba(0, 255, 136, 0.2);
-            background: rgba(255, 255, 255, 0.12);
-        }
-
-        .btn-login {
-            width: 100%;
-            background: linear-gradient(45deg, #00ff88, #00ccff);
-            border: none;
-            color: #1a1a2e;
-            padding: 15px 30px;
-            font-size: 1.1rem;
-            font-weight: 600;
-            border-radius: 12px;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-
-        .btn-login:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 15px 30px rgba(0, 255, 136, 0.3);
-        }
-
-        .error-message {
-            background: rgba(220, 53, 69, 0.1);
-            border: 1px solid rgba(220, 53, 69, 0.3);
-            color: #dc3545;
-            padding: 15px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            font-weight: 500;
-        }
-
-        .creator {
-            margin-top: 30px;
-            color: #64ffda;
-            font-size: 0.9rem;
-            opacity: 0.8;
-        }
-
-        .creator a {
-            color: #64ffda;
-            text-decoration: none;
-            transition: all 0.3s ease;
-        }
-
-        .creator a:hover {
-            color: #00ff88;
-            text-shadow: 0 0 10px rgba(0, 255, 136, 0.5);
-        }
-
-        @keyframes fadeInUp {
-            from {
-                opacity: 0;
-                transform: translateY(30px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        .lock-icon {
-            font-size: 4rem;
-            color: #00ff88;
-            margin-bottom: 20px;
-            text-shadow: 0 0 20px rgba(0, 255, 136, 0.4);
-        }
-    </style>
-</head>
-<body>
-    <div class="login-container">
-        <div class="lock-icon">🔐</div>
+        pending = asyncio.get_running_loop().create_future()
+        self.inflight[key] = pending
+        height = self.height
+        try:
+            async with self._upstream_slots:
+                reply = await run_blocking(self._forward, method, path, body)
+            RPC_PROXY_REQUESTS.inc(('miss',) if cacheable else ('uncached',))
+        except requests.RequestException:
+            RPC_PROXY_REQUESTS.inc(('error',))
+            reply = proxy_error(502, 'monerod is not reachable')
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            # Coalesced waiters must not hang (holding their client slots) on a failure
+            RPC_PROXY_REQUESTS.inc(('error',))
+            pending.set_exception(e)
+            pending.exception()  # Marked retrieved: it is raised to this caller below
+            raise
+        finally:
+            del self.inflight[key]
+        if cacheable and reply.status == 200 and height == self.height:
+            self._store(key, height, reply)
+        pending.set_result(reply)
+        return reply
+
+    def _store(self, key, height, reply):
+        """Cache reply, evicting the oldest entries past the entry and byte limits"""
+        if len(reply.body) > RPC_PROXY_CACHE_BYTES // 16:
+            return  # One oversized reply would push out everything else
+        old = self.cache.pop(key, None)
+        if old is not None:
+            self.cache_bytes -= len(old[2].body)
+        self.cache[key] = (height, time.monotonic(), reply)
+        self.cache_bytes += len(reply.body)
+        while len(self.cache) > RPC_PROXY_CACHE_ENTRIES or self.cache_bytes > RPC_PROXY_CACHE_BYTES:
+            evicted = self.cache.pop(next(iter(self.cache)))
+            self.cache_bytes -= len(evicted[2].body)
+
+    def _forward(self, method, path, body):
+        content_type = 'application/octet-stream' if path.endswith('.bin') else 'application/json'
+        response = self.session.request(method, self.upstream + path, data=body or None,
+                                        headers={'Content-Type': content_type}, timeout=RPC_PROXY_UPSTREAM_TIMEOUT)
+        return ProxyReply(response.status_code, response.headers.get('Content-Type', content_type), response.content)
+
+
+rpc_proxy = RpcProxy(f'http://127.0.0.1:{MONEROD_RESTRICTED_RPC_PORT}', RPC_PROXY_PORT)
+status_store.subscribe(rpc_proxy.on_status)
+
+# ========== Startup Pipeline ==========
+StartupPhase = namedtuple('StartupPhase', 'name state started duration')
+
+class StartupStage:
+    def __init__(self, name, run, requires=(), timeout=None, status=None, optional=False):
+        self.name = name
+        self.run = run  # Coroutine function called with the timeout; falsy result means the gate never opened
+        self.requires = requires
+        self.timeout = timeout
+        self.status = status
+        self.optional = optional  # Failure is recorded but does not fail the startup
+
+
+class StartupPipeline:
+    """Runs startup stages as soon as the stages they require have succeeded.
+
+    Stages run as tasks on the core loop, so stages without a dependency
+    between them run concurrently. Every stage
+    records when it started (seconds since the pipeline started), how long
+    it took and how it ended: ok, timeout, error or skipped (a prerequisite
+    failed). The breakdown is published as startup_phases in the status.
+    Optional stages only feed metrics; their failure does not fail startup.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.phases = {}
+        self.started = None
+
+    def stage(self, name, run, requires=(), timeout=None, status=None, optional=False):
+        self.stages.append(StartupStage(name, run, requires, timeout, status, optional))
+
+    async def run(self):
+        """Run every stage to completion; returns the name of the first failure or None"""
+        self.started = time.monotonic()
+        self._done = {stage.name: asyncio.Event() for stage in self.stages}
+        self._ok = {}
+        for stage in self.stages:
+            self._record(stage.name, 'pending', None, None)
         
-        <div class="login-header">
-            <h1>🧅 Secure Access</h1>
-            <div class="subtitle">Monerod TOR Anonymous Launcher</div>
-        </div>
-
-        <div class="security-notice">
-            <strong>🛡️ Security Notice:</strong> This interface is protected to ensure your privacy and security.
-        </div>
-
-        {% if error %}
-        <div class="error-message">
-            ❌ {{ error }}
-        </div>
-        {% endif %}
-
-        <form method="POST">
-            <div class="form-group">
-                <label for="password">🔑 Master Password:</label>
-                <input type="password" id="password" name="password" class="form-control" 
-                       placeholder="Enter your secure password" required autofocus>
-            </div>
-
-            <button type="submit" class="btn-login">
-                🚀 Access Dashboard
-            </button>
-        </form>
-
-        <div class="creator">
-            Created by <a href="https://x.com/parthavain" target="_blank">@parthavain</a>
-        </div>
-    </div>
-
-    <script>
-        // Auto-focus password field
-        document.getElementById('password').focus();
+        await asyncio.gather(*(self._run_stage(stage) for stage in self.stages))
         
-        // Add enter key support
-        document.getElementById('password').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') {
-                document.querySelector('.btn-login').click();
-            }
-        });
-    </script>
-</body>
-</html>'''
-
-    with open('templates/login.html', 'w', encoding='utf-8') as f:
-        f.write(login_html)
-    
-    
-    html_content = '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Monerod TOR Anonymous Launcher</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, #1a1a2e 0%, #16213e 50%, #0f3460 100%);
-            color: #ffffff;
-            min-height: 100vh;
-            overflow-x: hidden;
-        }
-
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 20px;
-        }
-
-        .header {
-            text-align: center;
-            margin-bottom: 40px;
-            animation: fadeInDown 1s ease-out;
-        }
-
-        .header h1 {
-            font-size: 2.8rem;
-            background: linear-gradient(45deg, #00ff88, #00ccff);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            margin-bottom: 10px;
-            text-shadow: 0 0 30px rgba(0, 255, 136, 0.3);
-        }
-
-        .header .subtitle {
-            color: #8892b0;
-            font-size: 1.1rem;
-            margin-bottom: 5px;
-        }
-
-        .creator {
-            color: #64ffda;
-            font-size: 0.9rem;
-            opacity: 0.8;
-        }
-
-        .creator a {
-            color: #64ffda;
-            text-decoration: none;
-            transition: all 0.3s ease;
-        }
-
-        .creator a:hover {
-            color: #00ff88;
-            text-shadow: 0 0 10px rgba(0, 255, 136, 0.5);
-        }
-
-        .status-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-            gap: 25px;
-            margin-bottom: 40px;
-        }
-
-        .status-card {
-            background: rgba(255, 255, 255, 0.05);
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 20px;
-            padding: 25px;
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-        }
-
-        .status-card::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            height: 3px;
-            background: linear-gradient(90deg, #00ff88, #00ccff);
-            opacity: 0;
-            transition: opacity 0.3s ease;
-        }
-
-        .status-card:hover {
-            transform: translateY(-5px);
-            border-color: rgba(0, 255, 136, 0.3);
-            box-shadow: 0 20px 40px rgba(0, 0, 0, 0.3);
-        }
-
-        .status-card:hover::before {
-            opacity: 1;
-        }
-
-        .card-header {
-            display: flex;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-
-        .card-icon {
-            width: 40px;
-            height: 40px;
-            border-radius: 50%;
-            background: linear-gradient(45deg, #00ff88, #00ccff);
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            margin-right: 15px;
-            font-size: 1.2rem;
-        }
+        required = {stage.name for stage in self.stages if not stage.optional}
+        failed = [phase for phase in self.phases.values() if phase.state != 'ok' and phase.name in required]
+        return min(failed, key=lambda phase: phase.started or float('inf')).name if failed else None
 
-        .card-title {
-            font-size: 1.3rem;
-            font-weight: 600;
-        }
-
-        .card-value {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: #00ff88;
-            margin: 10px 0;
-        }
-
-        .card-description {
-            color: #8892b0;
-            font-size: 0.9rem;
-        }
-
-        .controls {
-            text-align: center;
-            margin-bottom: 40px;
-        }
-
-        .btn-primary {
-            background: linear-gradient(45deg, #00ff88, #00ccff);
-            border: none;
-            color: #1a1a2e;
-            padding: 15px 40px;
-            font-size: 1.1rem;
-            font-weight: 600;
-            border-radius: 50px;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-
-        .btn-primary:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 15px 30px rgba(0, 255, 136, 0.3);
-        }
-
-        .btn-primary:disabled {
-            opacity: 0.5;
-            cursor: not-allowed;
-            transform: none;
-        }
-
-        .btn-secondary {
-            background: linear-gradient(45deg, #ff4757, #ff6b7a);
-            border: none;
-            color: #ffffff;
-            padding: 15px 30px;
-            font-size: 1rem;
-            font-weight: 600;
-            border-radius: 50px;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-        }
-
-        .btn-secondary:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 15px 30px rgba(255, 71, 87, 0.3);
-        }
-
-        .logs-container {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 25px;
-            margin-top: 40px;
-        }
-
-        .log-panel {
-            background: rgba(0, 0, 0, 0.3);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 15px;
-            overflow: hidden;
-        }
-
-        .log-header {
-            background: rgba(0, 255, 136, 0.1);
-            padding: 15px 20px;
-            font-weight: 600;
-            font-size: 1.1rem;
-        }
-
-        .log-content {
-            height: 400px;
-            overflow-y: auto;
-            padding: 20px;
-            font-family: 'Courier New', monospace;
-            font-size: 0.85rem;
-            line-height: 1.4;
-        }
-
-        .log-content::-webkit-scrollbar {
-            width: 8px;
-        }
-
-        .log-content::-webkit-scrollbar-track {
-            background: rgba(255, 255, 255, 0.1);
-        }
-
-        .log-content::-webkit-scrollbar-thumb {
-            background: rgba(0, 255, 136, 0.3);
-            border-radius: 4px;
-        }
-
-        .status-indicator {
-            display: inline-block;
-            width: 10px;
-            height: 10px;
-            border-radius: 50%;
-            margin-right: 8px;
-        }
-
-        .status-running {
-            background: #00ff88;
-            box-shadow: 0 0 10px rgba(0, 255, 136, 0.5);
-            animation: pulse 2s infinite;
-        }
-
-        .status-stopped {
-            background: #ff4757;
-        }
-
-        .status-waiting {
-            background: #ffa502;
-            animation: pulse 2s infinite;
-        }
+    async def _run_stage(self, stage):
+        try:
+            for name in stage.requires:
+                await self._done[name].wait()
+                if not self._ok[name]:
+                    self._ok[stage.name] = False
+                    self._record(stage.name, 'skipped', None, None)
+                    return
+            
+            started = time.monotonic()
+            self._record(stage.name, 'running', started - self.started, None)
+            if stage.status:
+                update_status(status=stage.status)
+            try:
+                state = 'ok' if await stage.run(stage.timeout) else 'timeout'
+            except Exception as e:
+                log_message('monerod', f'ERROR: startup stage {stage.name} failed: {str(e)}')
+                state = 'error'
+            self._ok[stage.name] = state == 'ok'
+            self._record(stage.name, state, started - self.started, time.monotonic() - started)
+        finally:
+            self._done[stage.name].set()
+
+    def _record(self, name, state, started, duration):
+        self.phases[name] = StartupPhase(
+            name, state,
+            None if started is None else round(started, 3),
+            None if duration is None else round(duration, 3)
+        )
+        update_status(startup_phases=tuple(self.phases.values()))
+
+
+async def wait_until(check, timeout, interval=0.1, alive=None):
+    """Poll check() (plain or coroutine function) until truthy; gives up on timeout or once alive() is false"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = check()
+        if asyncio.iscoroutine(result):
+            result = await result
+        if result:
+            return True
+        if alive is not None and not alive():
+            return False
+        await asyncio.sleep(interval)
+    return False
+
+async def port_accepting(port):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 1)
+        writer.close()
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
 
-        @keyframes pulse {
-            0% { opacity: 1; }
-            50% { opacity: 0.5; }
-            100% { opacity: 1; }
-        }
+def tor_alive():
+    return tor_process is not None and tor_process.poll() is None
 
-        @keyframes fadeInDown {
-            from {
-                opacity: 0;
-                transform: translateY(-30px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
+def monerod_alive():
+    return monerod_process is not None and monerod_process.poll() is None
 
-        .onion-address {
-            background: rgba(0, 0, 0, 0.3);
-            border: 1px solid rgba(0, 255, 136, 0.3);
-            border-radius: 10px;
-            padding: 15px;
-            margin: 20px 0;
-            font-family: monospace;
-            word-break: break-all;
-            color: #00ff88;
-        }
+def rpc_answering():
+    try:
+        rpc_client.call('get_info')
+        return True
+    except (requests.RequestException, RpcError):
+        return False
+
+async def stage_start_tor(timeout):
+    global tor_controller
+    if tor_controller:
+        tor_controller.close()
+        tor_controller = None
+    tor_bootstrapped.clear()
+    update_status(tor_bootstrap=0)
+    await start_tor()
+    return True
+
+async def stage_onion_address(timeout):
+    onions = await run_blocking(wait_onion_addresses, timeout)
+    if not onions:
+        log_message('tor', 'ERROR: Failed to generate .onion addresses')
+        return False
+    current_onions.update(onions)
+    update_status(onion_address=onions['web'],
+                  rpc_onion_address=f"{onions['rpc']}:{HIDDEN_SERVICE_PORT}",
+                  p2p_onion_address=f"{onions['p2p']}:{HIDDEN_SERVICE_P2P_PORT}")
+    log_message('tor', f"Onion addresses generated: dashboard {onions['web']}, "
+                       f"RPC {onions['rpc']}:{HIDDEN_SERVICE_PORT}, P2P {onions['p2p']}:{HIDDEN_SERVICE_P2P_PORT}")
+    return True
+
+async def stage_tor_bootstrap(timeout):
+    if await wait_until(tor_bootstrapped.is_set, timeout, interval=0.25, alive=tor_alive) or tor_bootstrapped.is_set():
+        record_bootstrap_time()
+        return True
+    return False
+
+async def stage_socks_port(timeout):
+    return await wait_until(lambda: port_accepting(SOCKS_PORT), timeout, alive=tor_alive)
+
+async def stage_tor_control(timeout):
+    return await run_blocking(connect_tor_controller, timeout)
+
+async def stage_hidden_service(timeout):
+    # Tor reports HS_DESC UPLOADED once the onion descriptor reaches an HSDir
+    return await wait_until(tor_controller.hs_published.is_set, timeout, interval=0.5, alive=tor_alive)
+
+async def stage_tor_pool(timeout):
+    size = tor_pool_size()
+    if size > 1 or tor_pool.server is not None:
+        await tor_pool.start(size)
+    return True
+
+async def stage_start_monerod(timeout):
+    await start_monerod()
+    return True
+
+async def stage_monerod_rpc(timeout):
+    return await wait_until(lambda: run_blocking(rpc_answering), timeout, interval=0.5, alive=monerod_alive)
+
+async def start_all_services():
+    try:
+        pipeline = StartupPipeline()
+        pipeline.stage('tor_process', stage_start_tor, status='Starting TOR...')
+        pipeline.stage('onion_address', stage_onion_address, requires=('tor_process',),
+                       timeout=ONION_ADDRESS_TIMEOUT)
+        pipeline.stage('tor_bootstrap', stage_tor_bootstrap, requires=('tor_process',),
+                       timeout=TOR_BOOTSTRAP_TIMEOUT, status='Bootstrapping TOR network...')
+        pipeline.stage('socks_port', stage_socks_port, requires=('tor_process',), timeout=SOCKS_READY_TIMEOUT)
+        pipeline.stage('tor_control', stage_tor_control, requires=('tor_process',),
+                       timeout=TOR_CONTROL_TIMEOUT, optional=True)
+        pipeline.stage('hidden_service', stage_hidden_service, requires=('tor_control', 'onion_address'),
+                       timeout=HIDDEN_SERVICE_PUBLISH_TIMEOUT, optional=True)
+        pipeline.stage('tor_pool', stage_tor_pool, requires=('socks_port',))
+        pipeline.stage('monerod_process', stage_start_monerod,
+                       requires=('onion_address', 'tor_bootstrap', 'socks_port', 'tor_pool'),
+                       status='Starting monerod...')
+        pipeline.stage('monerod_rpc', stage_monerod_rpc, requires=('monerod_process',),
+                       timeout=MONEROD_RPC_TIMEOUT, status='Waiting for monerod RPC...')
+        
+        failed = await pipeline.run()
+        if failed:
+            update_status(status=f'Startup failed at {failed.replace("_", " ")}')
+            log_message('monerod', f'ERROR: startup failed at stage {failed}')
+            return False
+        
+        update_status(status='Services running anonymously via TOR')
+        log_message('monerod', 'monerod is now running anonymously through TOR network')
+        return True
+        
+    except Exception as e:
+        update_status(status=f'Error: {str(e)}')
+        log_message('monerod', f'ERROR: {str(e)}')
+        return False
 
-        @media (max-width: 768px) {
-            .logs-container {
-                grid-template-columns: 1fr;
-            }
-            
-            .header h1 {
-                font-size: 2rem;
-            }
-            
-            .status-grid {
-                grid-template-columns: 1fr;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🧅 Monerod TOR Anonymous Launcher</h1>
-            <div class="subtitle">Private & Anonymous Monero Daemon via TOR Network</div>
-            <div class="creator">Created by <a href="https://x.com/parthavain" target="_blank">@parthavain</a></div>
-        </div>
-
-        <div class="status-grid">
-            <div class="status-card">
-                <div class="card-header">
-                    <div class="card-icon">📊</div>
-                    <div class="card-title">Block Height</div>
-                </div>
-                <div class="card-value" id="blockHeight">0</div>
-                <div class="card-description">Current blockchain height</div>
-            </div>
-
-            <div class="status-card">
-                <div class="card-header">
-                    <div class="card-icon">🔄</div>
-                    <div class="card-title">Sync Status</div>
-                </div>
-                <div class="card-value" id="syncStatus">Not synced</div>
-                <div class="card-description">Blockchain synchronization</div>
-            </div>
+ShutdownStep = namedtuple('ShutdownStep', 'name result seconds')
 
-            
+class ShutdownSteps(list):
+    """ShutdownStep records of one stop operation, each timed and logged"""
 
-            
+    async def step(self, name, run):
+        started = time.monotonic()
+        result = await run()
+        self.append(ShutdownStep(name, result, round(time.monotonic() - started, 3)))
+        log_message('tor' if name.startswith('tor') else 'monerod', f'Shutdown: {name} {result} in {self[-1].seconds}s')
+        return result
 
-            <div class="status-card">
-                <div class="card-header">
-                    <div class="card-icon">🌐</div>
-                    <div class="card-title">Connections</div>
-                </div>
-                <div class="card-value" id="connections">0</div>
-                <div class="card-description">Network connections</div>
-            </div>
-
-            <div class="status-card">
-                <div class="card-header">
-                    <div class="card-icon">⏱️</div>
-                    <div class="card-title">Uptime</div>
-                </div>
-                <div class="card-value" id="uptime">00:00:00</div>
-                <div class="card-description">Service runtime</div>
-            </div>
-        </div>
-
-        <div class="status-card">
-            <div class="card-header">
-                <div class="card-icon">🧅</div>
-                <div class="card-title">
-                    <span class="status-indicator" id="torIndicator"></span>
-                    TOR Network Status
-                </div>
-            </div>
-            <div class="card-value" id="status">Ready</div>
-            <div class="onion-address" id="onionAddress">Onion Address: Waiting...</div>
-        </div>
-
-        <div class="controls">
-            <button class="btn-primary" id="startBtn" onclick="startServices()">
-                🚀 Launch Anonymous Monerod
-            </button>
-            <button class="btn-secondary" onclick="logout()" style="margin-left: 20px;">
-                🔐 Logout
-            </button>
-        </div>
-
-        <div class="logs-container">
-            <div class="log-panel">
-                <div class="log-header">
-                    <span class="status-indicator" id="torLogIndicator"></span>
-                    TOR Network Logs
-                </div>
-                <div class="log-content" id="torLogs">
-                    Waiting for TOR service to start...
-                </div>
-            </div>
-
-            <div class="log-panel">
-                <div class="log-header">
-                    <span class="status-indicator" id="monerodLogIndicator"></span>
-                    Monerod Daemon Logs
-                </div>
-                <div class="log-content" id="monerodLogs">
-                    Waiting for monerod service to start...
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        let isStarting = false;
-
-        function updateStatus() {
-            fetch('/api/status')
-                .then(response => {
-                    if (response.status === 401) {
-                        window.location.href = '/login';
-                        return;
-                    }
-                    return response.json();
-                })
-                .then(data => {
-                    if (!data) return;
-                    
-                    // Update status indicators
-                    const torIndicator = document.getElementById('torIndicator');
-                    const torLogIndicator = document.getElementById('torLogIndicator');
-                    const monerodLogIndicator = document.getElementById('monerodLogIndicator');
-
-                    if (data.tor_running) {
-                        torIndicator.className = 'status-indicator status-running';
-                        torLogIndicator.className = 'status-indicator status-running';
-                    } else {
-                        torIndicator.className = 'status-indicator status-stopped';
-                        torLogIndicator.className = 'status-indicator status-stopped';
-                    }
-
-                    if (data.monerod_running) {
-                        monerodLogIndicator.className = 'status-indicator status-running';
-                    } else {
-                        monerodLogIndicator.className = 'status-indicator status-stopped';
-                    }
-
-                    // Update values
-                    document.getElementById('status').textContent = data.status;
-                    document.getElementById('onionAddress').textContent = 'Onion Address: ' + data.onion_address;
-                    document.getElementById('blockHeight').textContent = data.block_height.toLocaleString();
-                    document.getElementById('syncStatus').textContent = data.sync_status;
-                    document.getElementById('miningStatus').textContent = data.mining_status;
-                    document.getElementById('hashRate').textContent = data.hash_rate;
-                    document.getElementById('connections').textContent = data.connections;
-                    document.getElementById('uptime').textContent = data.uptime;
-
-                    // Update start button
-                    const startBtn = document.getElementById('startBtn');
-                    if (data.tor_running && data.monerod_running) {
-                        startBtn.textContent = '✅ Services Running';
-                        startBtn.disabled = true;
-                        isStarting = false;
-                    } else if (isStarting) {
-                        startBtn.textContent = '⏳ Starting Services...';
-                        startBtn.disabled = true;
-                    } else {
-                        startBtn.textContent = '🚀 Launch Anonymous Monerod';
-                        startBtn.disabled = false;
-                    }
-                })
-                .catch(error => console.error('Status update error:', error));
-        }
 
-        function updateLogs() {
-            // Update TOR logs
-            fetch('/api/logs/tor')
-                .then(response => response.json())
-                .then(data => {
-                    const torLogs = document.getElementById('torLogs');
-                    torLogs.innerHTML = data.logs.join('\\n');
-                    torLogs.scrollTop = torLogs.scrollHeight;
-                })
-                .catch(error => console.error('TOR logs error:', error));
-
-            // Update monerod logs
-            fetch('/api/logs/monerod')
-                .then(response => response.json())
-                .then(data => {
-                    const monerodLogs = document.getElementById('monerodLogs');
-                    monerodLogs.innerHTML = data.logs.join('\\n');
-                    monerodLogs.scrollTop = monerodLogs.scrollHeight;
-                })
-                .catch(error => console.error('Monerod logs error:', error));
-        }
+async def wait_exit(process, timeout):
+    try:
+        await asyncio.wait_for(process.process.wait(), timeout)
+        return 'exited'
+    except asyncio.TimeoutError:
+        return 'timeout'
+
+async def force_stop(service, process):
+    await terminate_process(service, process, PROCESS_STOP_TIMEOUT)
+    return f'exit code {process.returncode}'
+
+async def stop_monerod(steps):
+    """Ask monerod to exit over RPC so LMDB is flushed; terminate, then kill, after MONEROD_STOP_TIMEOUT"""
+    process = monerod_process
+    if process is None or process.poll() is not None:
+        return
+    supervisor.expect_exit(process)
+    update_status(status='Stopping monerod...')
+    
+    async def request_stop():
+        try:
+            await run_blocking(rpc_client.stop_daemon)
+            return 'requested'
+        except (requests.RequestException, RpcError) as e:
+            return f'failed ({e.__class__.__name__})'
+    
+    requested = await steps.step('monerod_stop_daemon', request_stop)
+    timeout = MONEROD_STOP_TIMEOUT if requested == 'requested' else 0
+    if await steps.step('monerod_exit', lambda: wait_exit(process, timeout)) != 'exited':
+        await steps.step('monerod_terminate', lambda: force_stop('monerod', process))
+
+async def halt_tor(steps, name, process, controller):
+    """Halt a Tor through its control port when connected, otherwise (or if that fails) terminate it"""
+    halted = False
+    if controller is not None:
+        async def halt():
+            try:
+                await run_blocking(controller.command, 'SIGNAL HALT')
+                return 'requested'
+            except TorControlError as e:
+                return f'failed ({e})'
+        
+        halted = await steps.step(f'{name}_halt', halt) == 'requested'
+        controller.close()
+    if not halted or await steps.step(f'{name}_exit', lambda: wait_exit(process, TOR_STOP_TIMEOUT)) != 'exited':
+        await steps.step(f'{name}_terminate', lambda: force_stop(name, process))
+
+async def stop_tor(steps):
+    """Stop the pool's extra instances, then the primary Tor"""
+    global tor_controller
+    await tor_pool.stop(steps)
+    process = tor_process
+    if process is None or process.poll() is not None:
+        return
+    supervisor.expect_exit(process)
+    update_status(status='Stopping TOR...')
+    controller, tor_controller = tor_controller, None
+    await halt_tor(steps, 'tor', process, controller)
+
+async def stop_all_services():
+    """Stop monerod cleanly, then Tor; returns a ShutdownStep per step taken.
+
+    Tor goes last, since monerod needs it until the end.
+    """
+    supervisor.cancel_restart()
+    steps = ShutdownSteps()
+    await stop_monerod(steps)
+    await stop_tor(steps)
+    update_status(tor_running=False, monerod_running=False, status='Services stopped')
+    return list(steps)
+
+async def start_monerod_services():
+    """The monerod half of the startup pipeline, for restarts while Tor keeps running"""
+    pipeline = StartupPipeline()
+    pipeline.stage('monerod_process', stage_start_monerod, status='Starting monerod...')
+    pipeline.stage('monerod_rpc', stage_monerod_rpc, requires=('monerod_process',),
+                   timeout=MONEROD_RPC_TIMEOUT, status='Waiting for monerod RPC...')
+    failed = await pipeline.run()
+    if failed:
+        update_status(status=f'Restart failed at {failed.replace("_", " ")}')
+        log_message('monerod', f'ERROR: restart failed at stage {failed}')
+        return False
+    update_status(status='Services running anonymously via TOR')
+    return True
+
+# ========== Process Supervisor ==========
+async def terminate_process(service, process, timeout):
+    """Terminate a child and wait for it, killing it after timeout"""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.process.wait(), timeout)
+    except asyncio.TimeoutError:
+        log_message('tor' if service.startswith('tor') else service, f'{service} did not exit within {timeout}s, killing it')
+        process.kill()
+        await process.process.wait()
+
+ExitRecord = namedtuple('ExitRecord', 'service code reason at ran_for')
+
+# NTSTATUS codes tor.exe/monerod.exe commonly die with on Windows
+WINDOWS_EXIT_CODES = {
+    0xC0000005: 'access violation',
+    0xC0000017: 'out of memory',
+    0xC00000FD: 'stack overflow',
+    0xC000013A: 'terminated by Ctrl+C',
+    0xC0000409: 'stack buffer overrun'
+}
 
-        function startServices() {
-            if (isStarting) return;
-            
-            isStarting = true;
-            const startBtn = document.getElementById('startBtn');
-            startBtn.textContent = '⏳ Starting Services...';
-            startBtn.disabled = true;
-
-            fetch('/api/start', { method: 'POST' })
-                .then(response => {
-                    if (response.status === 401) {
-                        window.location.href = '/login';
-                        return;
-                    }
-                    return response.json();
-                })
-                .then(data => {
-                    if (data) {
-                        console.log('Start request sent:', data.message);
-                    }
-                })
-                .catch(error => {
-                    console.error('Start error:', error);
-                    isStarting = false;
-                    startBtn.textContent = '🚀 Launch Anonymous Monerod';
-                    startBtn.disabled = false;
-                });
-        }
+def describe_exit(code):
+    if code == 0:
+        return 'exited cleanly'
+    if code < 0:
+        try:
+            return f'killed by {signal.Signals(-code).name}'
+        except ValueError:
+            return f'killed by signal {-code}'
+    name = WINDOWS_EXIT_CODES.get(code & 0xFFFFFFFF)
+    if name:
+        return f'crashed: {name} (0x{code & 0xFFFFFFFF:08X})'
+    return f'exited with code {code}'
+
+
+class CrashHistory:
+    """Restart policy for one crashing child, shared by the supervisor and the Tor pool.
+
+    A run of RESTART_STABLE_AFTER seconds forgets earlier crashes. Restarts
+    back off exponentially from RESTART_BACKOFF_INITIAL up to
+    RESTART_BACKOFF_MAX, and more than CRASH_LOOP_LIMIT crashes inside
+    CRASH_LOOP_WINDOW mean the child is crash-looping.
+    """
+
+    def __init__(self):
+        self.times = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def clear(self):
+        self.times.clear()
+
+    def record(self, ran_for):
+        """Note a crash after ran_for seconds; returns the restart delay, or None when crash-looping"""
+        now = time.monotonic()
+        if ran_for >= RESTART_STABLE_AFTER:
+            self.times.clear()
+        self.times = [t for t in self.times if now - t < CRASH_LOOP_WINDOW] + [now]
+        if len(self.times) > CRASH_LOOP_LIMIT:
+            return None
+        return min(RESTART_BACKOFF_INITIAL * 2 ** (len(self.times) - 1), RESTART_BACKOFF_MAX)
+
+
+class Supervisor:
+    """Restarts tor and monerod when they exit without being asked to.
+
+    watch() awaits each child's exit on the core loop, so a crash is seen
+    the moment it happens. Restart delays and crash-loop detection come
+    from one CrashHistory per service. monerod reaches the
+    network through Tor's SOCKS port, so a Tor crash stops monerod first
+    and re-runs the full startup pipeline, which brings monerod back only
+    once the new Tor is ready.
+    """
+
+    def __init__(self):
+        self.exits = []
+        self._crashes = {'tor': CrashHistory(), 'monerod': CrashHistory()}
+        self._expected = set()  # Processes being stopped on purpose
+        self._restart = None
+
+    def watch(self, service, process):
+        asyncio.ensure_future(self._wait(service, process, time.monotonic()))
+
+    def cancel_restart(self):
+        """Drop a pending automatic restart and forget past crashes"""
+        if self._restart is not None and not self._restart.done():
+            self._restart.cancel()
+        self._restart = None
+        for crashes in self._crashes.values():
+            crashes.clear()
+
+    def expect_exit(self, process):
+        """Mark an exit as requested, so it is not treated as a crash"""
+        self._expected.add(process)
+
+    async def _wait(self, service, process, started):
+        code = await process.process.wait()
+        ran_for = time.monotonic() - started
+        expected = process in self._expected
+        self._expected.discard(process)
+        if process is not (tor_process if service == 'tor' else monerod_process):
+            return  # Superseded by a newer run
+        
+        reason = describe_exit(code)
+        record = ExitRecord(service, code, reason, datetime.now().isoformat(timespec='seconds'), round(ran_for, 1))
+        self.exits = (self.exits + [record])[-20:]
+        update_status(**{f'{service}_running': False},
+                      last_exit=f'{service} {reason} after {round(ran_for)}s at {record.at}')
+        log_message(service, f'{service} {reason} after {round(ran_for)}s')
+        if expected or lifecycle.state != 'running':
+            return  # Stopped on purpose, or died during startup and failed that instead
+        
+        crashes = self._crashes[service]
+        delay = crashes.record(ran_for)
+        if delay is None:
+            update_status(status=f'{service} crashed {len(crashes)} times in {CRASH_LOOP_WINDOW // 60} min; '
+                                 f'not restarting')
+            log_message(service, f'ERROR: {service} is crash-looping, automatic restart disabled')
+            lifecycle.crashed()
+            return
+        
+        if service == 'monerod' and self._restart is not None and not self._restart.done():
+            return  # A Tor restart is already bringing monerod back
+        if self._restart is not None:
+            self._restart.cancel()
+        update_status(status=f'{service} {reason}; restarting in {delay}s')
+        self._restart = asyncio.ensure_future(self._restart_after(service, delay))
+
+    async def _restart_after(self, service, delay):
+        await asyncio.sleep(delay)
+        log_message(service, f'Restarting {service} after crash {len(self._crashes[service])}')
+        PROCESS_RESTARTS.inc((service,))
+        if service == 'tor':
+            update_status(tor_restarts=current_status().tor_restarts + 1)
+            await stop_monerod(ShutdownSteps())  # stop_daemon first, so LMDB is flushed
+            ok = await start_all_services()
+        else:
+            update_status(monerod_restarts=current_status().monerod_restarts + 1)
+            ok = await start_monerod_services()
+        if not ok:
+            log_message(service, f'ERROR: automatic restart of {service} failed')
+            lifecycle.crashed()  # Let /api/start try again; it clears what the failed pipeline left
+
+
+supervisor = Supervisor()
+
+# ========== Service Lifecycle ==========
+class ServiceLifecycle:
+    """stopped -> starting -> running -> stopping -> stopped, one transition at a time.
+
+    start(), stop() and restart() may be called from any thread. A lock
+    guards the state, so a request that arrives while an operation is in
+    flight joins it instead of launching a second one: repeated starts
+    report the running startup, repeated stops share one shutdown and its
+    step timings. Stopping during startup cancels the startup first.
+    """
+
+    def __init__(self):
+        self.state = 'stopped'
+        self._lock = threading.Lock()
+        self._stopping = None  # concurrent.futures.Future of the in-flight shutdown
+        self._start_task = None
+
+    def start(self):
+        """Begin starting unless already starting, running or stopping; returns (state, started)"""
+        with self._lock:
+            if self.state != 'stopped':
+                return self.state, False
+            self._set('starting')
+            core.submit(self._run_start())
+            return self.state, True
+
+    def stop(self):
+        """Begin (or join) a shutdown; returns a Future of its ShutdownSteps, or None if nothing runs"""
+        with self._lock:
+            if self.state == 'stopping':
+                return self._stopping
+            if self.state == 'stopped' and not (tor_alive() or monerod_alive()):
+                return None
+            self._set('stopping')
+            self._stopping = core.submit(self._run_stop())
+            return self._stopping
+
+    def restart(self):
+        """stop() then start(); returns (state, Future resolving once the shutdown half is done).
+
+        The Future is None while starting: there is nothing to restart yet.
+        """
+        with self._lock:
+            if self.state == 'starting':
+                return self.state, None
+            if self.state != 'stopping':
+                self._set('stopping')
+                self._stopping = core.submit(self._run_stop(restart=True))
+            return self.state, self._stopping
+
+    def restart_monerod(self):
+        """Restart only monerod (e.g. for a new profile) while running; returns whether it started"""
+        with self._lock:
+            if self.state != 'running':
+                return False
+            self._set('starting')
+            core.submit(self._run_monerod_restart())
+            return True
+
+    def crashed(self):
+        """The supervisor gave up on a service or failed to restart it; allow a fresh start"""
+        with self._lock:
+            if self.state == 'running':
+                self._set('stopped')
+
+    def _set(self, state):
+        self.state = state
+        update_status(service_state=state)
+
+    async def _run_start(self):
+        self._start_task = asyncio.current_task()
+        ok = False
+        try:
+            if tor_alive() or monerod_alive():
+                await stop_all_services()  # Leftovers of a failed start or a crash loop
+            ok = await start_all_services()
+        finally:
+            with self._lock:
+                if self.state == 'starting':  # Not pre-empted by stop()
+                    self._set('running' if ok else 'stopped')
+
+    async def _run_monerod_restart(self):
+        self._start_task = asyncio.current_task()
+        ok = False
+        try:
+            supervisor.cancel_restart()
+            await stop_monerod(ShutdownSteps())
+            ok = await start_monerod_services()
+        finally:
+            with self._lock:
+                if self.state == 'starting':
+                    self._set('running' if ok else 'stopped')
+
+    async def _run_stop(self, restart=False):
+        task = self._start_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.wait([task])
+        try:
+            steps = await stop_all_services()
+        finally:
+            with self._lock:
+                self._set('starting' if restart else 'stopped')
+        if restart:
+            asyncio.ensure_future(self._run_start())
+        return steps
 
-        function logout() {
-            if (confirm('Are you sure you want to logout?')) {
-                window.location.href = '/logout';
-            }
-        }
 
-        // Initialize
-        updateStatus();
-        updateLogs();
+lifecycle = ServiceLifecycle()
 
-        // Set up periodic updates
-        setInterval(updateStatus, 2000);  // Update status every 2 seconds
-        setInterval(updateLogs, 5000);    // Update logs every 5 seconds
-    </script>
-</body>
-</html>'''
+def start_web_server():
+    global web_server, server_thread, metrics_server
     
-    with open('templates/index.html', 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    load_pages()
     
     # Start the web server
-    web_server = make_server('127.0.0.1', WEB_PORT, app, threaded=True)
-    server_thread = threading.Thread(target=web_server.serve_forever, daemon=True)
-    server_thread.start()
+    if uvicorn is not None:
+        config = uvicorn.Config(DashboardAsgi(app), host='127.0.0.1', port=WEB_PORT,
+                                lifespan='off', log_level='warning', access_log=False)
+        web_server = uvicorn.Server(config)
+        server_thread = core.submit(web_server.serve())
+    else:
+        web_server = make_server('127.0.0.1', WEB_PORT, app, threaded=True)
+        server_thread = threading.Thread(target=web_server.serve_forever, daemon=True)
+        server_thread.start()
+    
+    metrics_server = make_server('127.0.0.1', METRICS_PORT, metrics_wsgi, threaded=True,
+                                 request_handler=QuietRequestHandler)
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    core.run(rpc_proxy.start())
     
     print(f"Web interface started at http://127.0.0.1:{WEB_PORT} Tor port: 80")
+    print(f"Prometheus metrics at http://127.0.0.1:{METRICS_PORT}/metrics")
+    print(f"Onion RPC proxy at http://127.0.0.1:{RPC_PROXY_PORT} -> 127.0.0.1:{MONEROD_RESTRICTED_RPC_PORT}")
     print("Once TOR is running, it will also be accessible via the .onion address")
 
+def stop_web_server():
+    if uvicorn is not None and isinstance(web_server, uvicorn.Server):
+        web_server.should_exit = True
+        try:
+            server_thread.result(timeout=5)
+        except concurrent.futures.TimeoutError:
+            pass
+    else:
+        web_server.shutdown()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    core.call_soon(rpc_proxy.stop)
+
 # ========== Main Application ==========
+shutdown_requested = threading.Event()
+
+def request_shutdown(signum, frame):
+    """Signal handler: let the main loop run the ordered shutdown"""
+    if shutdown_requested.is_set():
+        raise KeyboardInterrupt  # Second signal: stop waiting
+    shutdown_requested.set()
+
 if __name__ == "__main__":
     print("*"*60)
     print("🧅 MONEROD TOR ANONYMOUS LAUNCHER")
@@ -1109,21 +3676,26 @@ if __name__ == "__main__":
   
     start_web_server()
     
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):  # SIGBREAK: Ctrl+Break / console close on Windows
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), request_shutdown)
+    
     try:
-       
-        while True:
-            time.sleep(1)
+        while not shutdown_requested.wait(1):
+            pass
     except KeyboardInterrupt:
-        print("\\nShutting down services...")
-        
-     
-        if tor_process:
-            tor_process.terminate()
-        if monerod_process:
-            monerod_process.terminate()
-        if web_server:
-            web_server.shutdown()
-            print("Services stopped.")
-         
-        print("Services stopped.")
+        pass
+    
+    print("\\nShutting down services...")
+    try:
+        operation = lifecycle.stop()
+        for step in operation.result(MONEROD_STOP_TIMEOUT + 3 * PROCESS_STOP_TIMEOUT) if operation else []:
+            print(f"  {step.name}: {step.result} ({step.seconds}s)")
+    except concurrent.futures.TimeoutError:
+        print("Shutdown timed out; exiting anyway")
+    for archive in log_archives.values():
+        archive.flush()
+    if web_server:
+        stop_web_server()
+    print("Services stopped.")
         